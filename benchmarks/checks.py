@@ -0,0 +1,317 @@
+"""Reference checks for the solvers and engines run.py's fixed cases do not cover.
+
+    python -m benchmarks.checks               # every check
+    python -m benchmarks.checks -k inverse
+
+The randomized checks draw their inputs from a fixed seed, so a failure reproduces,
+and compare against an independent computation: the scalar loop, the metric
+recomputed from the answer, or a full recompute. The rest pin edge cases that broke
+before. The run fails if any check reports a problem.
+"""
+import argparse
+import math
+import sys
+from fractions import Fraction
+
+import numpy as np
+
+from creative_financing.batch import DEFAULT_CONSTRAINTS, best_terms_rows
+from creative_financing.best_terms import TARGET_CASH_ON_CASH_RETURN, evaluate_candidates, fine_grid, optimize_terms, search_terms_fine, search_terms_grid
+from creative_financing.cache import ResultCache
+from creative_financing.incremental import IncrementalSchedule
+from creative_financing.inverse import solve_terms
+from creative_financing.schedules import amortization_schedules, deal_terms, seller_financing_schedule
+from creative_financing.seller_financing import seller_financing_calculator
+from creative_financing.server import parse_seller_financing, seller_financing_batch
+
+
+CHECKS = {}
+
+
+def check(func):
+    CHECKS[func.__name__] = func
+    return func
+
+
+####################################################
+#                      CHECKS                      #
+####################################################
+@check
+def fine_terms(cases=150, seed=13):
+    """search_terms_fine finds the same best seller earnings as search_terms_grid's
+    exhaustive search of the same fine grids, and the same candidate however small
+    max_cells chunks it. optimize_terms(method='fine') and 'anytime' run to the end
+    agree with it, with whole percents returned as ints.
+    """
+    rng = np.random.default_rng(seed)
+    problems = []
+    for i in range(cases):
+        listing_price = int(rng.integers(100000, 800000))
+        rental_income = listing_price * rng.uniform(0.004, 0.012)
+        monthly_expenses = rental_income * rng.uniform(0.1, 0.4)
+        low_down = int(rng.integers(0, 30))
+        low_rate = int(rng.integers(0, 8))
+        arguments = dict(
+            listing_price=listing_price, min_down_payment_pct=low_down, max_down_payment_pct=low_down + int(rng.integers(0, 21)),
+            min_interest_rate=low_rate, max_interest_rate=low_rate + int(rng.integers(0, 7)), rental_income=rental_income, monthly_expenses=monthly_expenses,
+            balloon_years=int(rng.integers(3, 11)), required_seller_earnings_pct=int(rng.integers(0, 15)), price_step=int(rng.choice([1000, 5000])),
+            rate_step=float(rng.choice([0.125, 0.25, 0.5])), down_payment_step=float(rng.choice([0.05, 0.1, 0.25])))
+
+        pcts = fine_grid(arguments['min_down_payment_pct'], arguments['max_down_payment_pct'], arguments['down_payment_step'])
+        rates = fine_grid(arguments['min_interest_rate'], arguments['max_interest_rate'], arguments['rate_step'])
+        prices = range(int(listing_price * 0.8), listing_price + 1, arguments['price_step'])
+        required = listing_price * (1 + arguments['required_seller_earnings_pct'] / 100)
+        search = (pcts, rates, prices, [arguments['balloon_years']], rental_income, monthly_expenses, TARGET_CASH_ON_CASH_RETURN, required)
+        exhaustive, fine = search_terms_grid(*search), search_terms_fine(*search)
+        if (exhaustive is None) != (fine is None) or (fine is not None and not np.isclose(fine[0], exhaustive[0], rtol=1e-12)):
+            problems.append('case %d %s: fine %s, exhaustive %s' % (i, arguments, fine and fine[0], exhaustive and exhaustive[0]))
+            continue
+        # chunked by price (64 cells) and by rate (4096), the very same candidate
+        for max_cells in (64, 4096):
+            chunked = search_terms_fine(*search, max_cells=max_cells)
+            if chunked != fine:
+                problems.append('case %d %s: max_cells=%d gives %s, unchunked %s' % (i, arguments, max_cells, chunked, fine))
+
+        terms = {method: optimize_terms(**arguments, method=method) for method in ('fine', 'anytime')}
+        if (terms['fine'] is None) != (terms['anytime'] is None) or (terms['fine'] and terms['fine']['seller_earnings'] != terms['anytime']['seller_earnings']):
+            problems.append('case %d %s: fine and anytime disagree' % (i, arguments))
+        for method, result in terms.items():
+            for name in ('down_payment_pct', 'interest_rate'):
+                if result and float(result[name]).is_integer() and not isinstance(result[name], int):
+                    problems.append('case %d: %s %s %r is not an int' % (i, method, name, result[name]))
+    return cases, problems
+
+
+@check
+def incremental_walk(steps=4000, seed=21):
+    """IncrementalSchedule gives exactly seller_financing_schedule's result along a
+    random walk of one input at a time, through every path, with a cache big enough to
+    keep all state and one so small it evicts on almost every step.
+    """
+    problems = []
+    for cache_bytes in (64 * 2 ** 20, 20000):
+        rng = np.random.default_rng(seed)
+        cache = ResultCache(cache_bytes)
+        inputs = dict(sale_price=400000, down_payment_rate=10, annual_interest_rate=5, loan_term_years=30, balloon_due_years=5, interest_only_years=1)
+        draws = dict(
+            sale_price=lambda: int(rng.integers(0, 2000000)),
+            down_payment_rate=lambda: int(rng.integers(0, 101)),
+            annual_interest_rate=lambda: float(rng.choice([0, 1, 3.5, 5, 7.25, 30, 100])),
+            loan_term_years=lambda: int(rng.integers(0, 51)),
+            balloon_due_years=lambda: [None, 0, 1, 5, 10, 30, 60][rng.integers(7)],
+            interest_only_years=lambda: [None, 0, 1, 3, 10, 100][rng.integers(6)])
+        previous, paths = None, set()
+        for step in range(steps):
+            name = list(draws)[rng.integers(len(draws))]
+            inputs[name] = draws[name]()
+            schedule = IncrementalSchedule(previous, cache)
+            previous = dict(inputs)
+            try:
+                expected = seller_financing_schedule(**inputs)
+            except ValueError:
+                try:
+                    schedule(**inputs)
+                    problems.append('step %d %s: no ValueError' % (step, inputs))
+                except ValueError:
+                    pass
+                continue
+            result = schedule(**inputs)
+            paths.add(schedule.path)
+            table, expected_table = result.pop("Amortization Table"), expected.pop("Amortization Table")
+            if result != expected or any(not np.array_equal(table[column], expected_table[column]) for column in expected_table):
+                problems.append('step %d %s: %s path differs' % (step, inputs, schedule.path))
+        if cache_bytes > 20000 and paths != {'full', 'loan', 'suffix', 'slice'}:
+            problems.append('paths taken: %s' % ', '.join(sorted(paths)))
+    return 2 * steps, problems
+
+
+@check
+def inverse_down_payment(cases=2000, seed=14):
+    """solve_terms('down_payment_pct', ...) is the lowest down payment meeting a buyer target.
+
+    Rates run from 0 to 12%, both sides of the ~5.6% where a 30 year loan's annual
+    payment rate crosses a 7% cash-on-cash target, so cash-on-cash both rises and falls
+    with the down payment. Each answer is plugged back in and compared with a 0.01%
+    grid of down payments.
+    """
+    rng = np.random.default_rng(seed)
+    price = rng.uniform(50000, 1000000, cases)
+    rate = rng.choice(np.arange(0, 12.125, 0.125), cases)
+    rent = price * rng.uniform(0.002, 0.015, cases)
+    expenses = rent * rng.uniform(0, 0.5, cases)
+    metric = rng.choice(['monthly_payment', 'monthly_cash_flow', 'cash_on_cash_return'], cases)
+    target = np.select([metric == 'monthly_payment', metric == 'monthly_cash_flow'], [rent * rng.uniform(0.2, 1.5, cases), rent * rng.uniform(-0.2, 0.6, cases)], rng.uniform(0.0, 0.3, cases))
+
+    problems = []
+    grid = np.linspace(0, 100, 10001)
+    for i in range(cases):
+        solved = float(solve_terms('down_payment_pct', metric[i], target[i], offer_price=price[i], interest_rate=rate[i], rental_income=rent[i], monthly_expenses=expenses[i]))
+        _, payment, cash_on_cash_return = evaluate_candidates(grid, rate[i], price[i], rent[i], expenses[i])
+        value = {'monthly_payment': -payment, 'monthly_cash_flow': rent[i] - payment - expenses[i], 'cash_on_cash_return': cash_on_cash_return}[metric[i]]
+        goal = -target[i] if metric[i] == 'monthly_payment' else target[i]
+        meets = value >= goal - 1e-9 * max(1, abs(goal))
+        if np.isnan(solved):
+            if meets.any():
+                problems.append('%s %d: NaN, but %.2f%% down meets %g' % (metric[i], i, grid[meets.argmax()], target[i]))
+            continue
+        _, payment, cash_on_cash_return = evaluate_candidates(solved, rate[i], price[i], rent[i], expenses[i])
+        at = {'monthly_payment': -payment, 'monthly_cash_flow': rent[i] - payment - expenses[i], 'cash_on_cash_return': cash_on_cash_return}[metric[i]]
+        if at < goal - 1e-9 * max(1, abs(goal)):
+            problems.append('%s %d: %.4f%% down misses %g' % (metric[i], i, solved, target[i]))
+        elif meets[grid < solved - 0.01].any():
+            problems.append('%s %d: %.4f%% down, but %.2f%% already meets %g' % (metric[i], i, solved, grid[meets.argmax()], target[i]))
+    return cases, problems
+
+
+@check
+def inverse_bounds(cases=2000, seed=140):
+    """Every solve_terms answer is NaN or a finite value in range, for every term and
+    metric, with 0% and 100% down (no loan, where any price meets a payment target)
+    drawn often.
+    """
+    rng = np.random.default_rng(seed)
+    terms = dict(
+        offer_price=rng.uniform(0, 1000000, cases), down_payment_pct=np.where(rng.random(cases) < 0.5, rng.choice([0, 100], cases), rng.uniform(0, 100, cases)),
+        interest_rate=rng.choice(np.arange(0, 20.125, 0.125), cases), rental_income=rng.uniform(0, 10000, cases),
+        monthly_expenses=rng.uniform(0, 3000, cases), balloon_years=rng.integers(1, 31, cases))
+    targets = {'monthly_payment': rng.uniform(0, 5000, cases), 'monthly_cash_flow': rng.uniform(-2000, 5000, cases),
+               'cash_on_cash_return': rng.uniform(-0.2, 0.3, cases), 'balloon_amount': rng.uniform(0, 1000000, cases)}
+    bounds = {'offer_price': (0, np.inf), 'down_payment_pct': (0, 100), 'interest_rate': (0, 100)}
+
+    problems = []
+    for solve_for, (low, high) in bounds.items():
+        for metric, target in targets.items():
+            solved = solve_terms(solve_for, metric, target, **{name: value for name, value in terms.items() if name != solve_for})
+            bad = ~np.isnan(solved) & ~(np.isfinite(solved) & (solved >= low) & (solved <= high))
+            for i in np.flatnonzero(bad)[:3]:
+                problems.append('%s for %s %g: %r at %s' % (solve_for, metric, target[i], solved[i], {name: value[i] for name, value in terms.items()}))
+    return cases * len(bounds) * len(targets), problems
+
+
+@check
+def exact_schedules(cases=300, seed=15):
+    """amortization_schedules' balances are the exact rational balances, rounded half up.
+
+    The reference is L g - P (g - 1) / r in Fractions under the rounded payment, with the
+    same rules: paid off in the month the balance reaches 0, the last row pays off the
+    rest, ValueError once a balance outgrows the 2**53 cents a float holds. Rates run to 100% in eighths
+    over terms up to 50 years, where the float closed form cancels.
+    """
+    rng = np.random.default_rng(seed)
+    price = rng.integers(0, 10000000, cases) + rng.integers(0, 100, cases) / 100
+    down = rng.integers(0, 101, cases)
+    rate = rng.choice(np.r_[np.arange(0, 15, 0.125), np.arange(15, 100.125, 0.125)], cases, p=np.r_[np.full(120, 0.7 / 120), np.full(681, 0.3 / 681)])
+    term = rng.integers(1, 51, cases)
+    balloon = rng.integers(0, 51, cases) * rng.integers(0, 2, cases)
+    interest_only = rng.integers(0, 6, cases) * rng.integers(0, 2, cases)
+
+    problems = []
+    for i in range(cases):
+        arguments = (price[i], down[i], rate[i], term[i], balloon[i], interest_only[i])
+        try:
+            result = amortization_schedules(*arguments)
+        except ValueError:
+            result = None
+        # the rounded payment is taken as given, the balances are what is checked
+        terms = deal_terms(*arguments)
+        loan_amount, payment = int(terms['loan_amount'][0]), int(terms['payment'][0])
+        r = Fraction(float(rate[i])) / 1200
+        total = int(term[i]) * 12
+        io_months = min(int(interest_only[i]) * 12, total)
+        last_month = int(balloon[i]) * 12 if 0 < balloon[i] * 12 <= total else total
+
+        expected, overflow = [], False
+        for month in range(1, last_month + 1):
+            k = max(month - io_months, 0)
+            growth = (1 + r) ** k
+            balance = loan_amount * growth - payment * (growth - 1) / r if r else loan_amount - payment * k
+            if abs(balance) >= 2 ** 53:
+                overflow = True
+                break
+            expected.append(math.floor(balance + Fraction(1, 2)))
+            if month < last_month and month > io_months and loan_amount > 0 and expected[-1] <= 0:
+                break
+        if overflow or result is None:
+            if overflow != (result is None):
+                problems.append('deal %d %s: %s' % (i, arguments, 'expected ValueError' if overflow else 'unexpected ValueError'))
+            continue
+        expected[-1] = 0
+
+        months = int(result["Months"][0])
+        table = {column: result[column][0, :months] for column in ("Monthly Payment", "Interest", "Principal", "Remaining Balance")}
+        if months != len(expected):
+            problems.append('deal %d %s: %d months, expected %d' % (i, arguments, months, len(expected)))
+        elif table["Remaining Balance"].tolist() != expected:
+            diff = np.abs(np.array(table["Remaining Balance"].tolist(), dtype=object) - np.array(expected, dtype=object)).max()
+            problems.append('deal %d %s: balance off by %d cents' % (i, arguments, diff))
+        elif (int(table["Principal"].sum()) != loan_amount or (table["Interest"] + table["Principal"] != table["Monthly Payment"]).any()):
+            problems.append('deal %d %s: rows do not tie out' % (i, arguments))
+    return cases, problems
+
+
+@check
+def batch_errors():
+    """best_terms_rows reports a bad row in its error column and carries on with the
+    next: text, NaN, inf and 1e400 (which parses to inf), and a finite price too big
+    for the search's integer ranges. Good rows get optimize_terms' pruned result.
+    """
+    good = dict(listing_price=359900, rental_income=2000, monthly_expenses=630)
+    bad = [dict(good, listing_price=value) for value in ('inf', '-inf', '1e400', 'nan', 'abc')]
+    bad += [dict(good, rental_income='inf'), dict(good, listing_price='1e300', price_step='1e299'), dict(good, monthly_expenses='')]
+    rows = best_terms_rows(bad + [good])
+    problems = ['row %d %s: no error reported' % (i, row) for i, (row, out) in enumerate(zip(bad, rows)) if not out['error']]
+    expected = optimize_terms(**dict(DEFAULT_CONSTRAINTS, **good), method='pruned')
+    if rows[-1]['error'] or rows[-1]['best_offer_price'] != expected['offer_price']:
+        problems.append('good row after the bad ones: %r, expected offer %r' % (rows[-1], expected['offer_price']))
+    return len(rows), problems
+
+
+@check
+def server_summaries(cases=200, seed=18):
+    """The API's seller financing results have the same keys in exact and float mode,
+    and exact mode's summary is seller_financing_calculator(exact=True)'s, in a batch.
+    """
+    rng = np.random.default_rng(seed)
+    items = []
+    for _ in range(cases):
+        item = dict(sale_price=float(rng.integers(50000, 1000000)), down_payment_rate=float(rng.integers(0, 101)), annual_interest_rate=float(rng.choice(np.arange(0, 15.125, 0.125))),
+                    loan_term_years=float(rng.integers(1, 41)), balloon_due_years=float(rng.choice([0, rng.integers(1, 41)])), interest_only_years=float(rng.choice([0, rng.integers(1, 41)])))
+        items += [parse_seller_financing(dict(item, exact=exact)) for exact in (False, True)]
+
+    problems = []
+    results = seller_financing_batch(items)
+    for i in range(0, len(items), 2):
+        float_result, exact_result = results[i], results[i + 1]
+        if set(float_result) != set(exact_result):
+            problems.append('%s: keys differ, float only %s, exact only %s' % (items[i], sorted(set(float_result) - set(exact_result)), sorted(set(exact_result) - set(float_result))))
+            continue
+        arguments = {name: items[i][name] or None for name in ('sale_price', 'down_payment_rate', 'annual_interest_rate', 'loan_term_years', 'balloon_due_years', 'interest_only_years')}
+        expected = seller_financing_calculator(**arguments, exact=True)
+        differ = [key for key in exact_result if key != 'Units' and exact_result[key] != expected[key]]
+        if differ:
+            problems.append('%s: exact %s differ from seller_financing_calculator' % (items[i], ', '.join(differ)))
+    return cases, problems
+
+
+####################################################
+#                   FUNCTION                       #
+####################################################
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-k', dest='pattern', help='only run checks whose name contains this')
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for name, func in CHECKS.items():
+        if args.pattern and args.pattern not in name:
+            continue
+        cases, problems = func()
+        sys.stderr.write('{:<40} {:>7} cases  {}\n'.format(name, cases, 'FAIL' if problems else 'ok'))
+        for problem in problems[:10]:
+            sys.stderr.write('    %s\n' % problem)
+        failed += bool(problems)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
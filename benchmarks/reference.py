@@ -0,0 +1,134 @@
+"""The calculators as they were before the vectorized engines, kept as the reference
+the benchmarks check numerical equality against. Do not optimize this module.
+"""
+import numpy_financial as npf
+import pandas as pd
+
+
+def seller_financing_calculator(sale_price, down_payment_rate, annual_interest_rate, loan_term_years, balloon_due_years=None, interest_only_years=None):
+    # Calculate the initial loan amount
+    down_payment = int(sale_price * (down_payment_rate/100))
+    loan_amount = sale_price - down_payment
+
+    # Monthly interest rate
+    monthly_interest_rate = annual_interest_rate / 100 / 12
+    # Total number of payments
+    total_payments = loan_term_years * 12
+
+    # Calculate the monthly payment for a fully amortizing loan
+    if monthly_interest_rate > 0:
+        monthly_payment = loan_amount * monthly_interest_rate / (1 - (1 + monthly_interest_rate) ** -total_payments)
+    else:
+        monthly_payment = loan_amount / total_payments
+
+    # Create amortization table
+    amortization_table = []
+    balance = loan_amount
+    for month in range(1, total_payments + 1):
+        interest_payment = balance * monthly_interest_rate
+        if interest_only_years and month <= interest_only_years * 12:
+            principal_payment = 0
+            monthly_payment_during_interest_only = loan_amount * monthly_interest_rate
+            amortization_table.append([month, monthly_payment_during_interest_only, interest_payment, principal_payment, balance])
+        else:
+            principal_payment = monthly_payment - interest_payment
+            balance -= principal_payment
+            amortization_table.append([month, monthly_payment, interest_payment, principal_payment, max(balance, 0)])
+
+        if balloon_due_years and month == balloon_due_years * 12:
+            balloon_payment = balance
+            amortization_table.append([month, monthly_payment, interest_payment, principal_payment, 0])
+            break
+
+    # Convert amortization table to DataFrame for better display
+    df_amortization_table = pd.DataFrame(amortization_table, columns=["Month", "Monthly Payment", "Interest", "Principal", "Remaining Balance"])
+
+    # Total interest paid
+    total_interest_paid = df_amortization_table["Interest"].sum()
+
+    # Total payments
+    total_payments_made = df_amortization_table["Monthly Payment"].sum() + (balloon_payment if balloon_due_years else 0)
+
+    return {
+        "Down Payment": down_payment,
+        "Balloon Amount": df_amortization_table.iloc[-2]['Remaining Balance'],
+        "Monthly Payment Interest Only": round(df_amortization_table.iloc[0]['Monthly Payment'], 2),
+        "Monthly Payment Non Interest Only": round(df_amortization_table.iloc[-1]['Monthly Payment'], 2),
+        "Monthly Payment": round(monthly_payment, 2),
+        "Total Interest Paid": round(total_interest_paid, 2),
+        "Total Payment Amount": round(total_payments_made, 2),
+        "Amortization Table": df_amortization_table.iloc[:-1]
+    }
+
+def calculate_monthly_payment(principal, annual_interest_rate, term_years):
+    monthly_interest_rate = annual_interest_rate / 100 / 12
+    number_of_payments = term_years * 12
+    if monthly_interest_rate == 0:
+        return principal / number_of_payments
+    else:
+        return principal * (monthly_interest_rate * (1 + monthly_interest_rate) ** number_of_payments) / ((1 + monthly_interest_rate) ** number_of_payments - 1)
+
+def calculate_balloon_payment(principal, annual_interest_rate, term_years, balloon_years):
+    monthly_interest_rate = annual_interest_rate / 100 / 12
+    number_of_payments = term_years * 12
+    balloon_payments = balloon_years * 12
+    monthly_payment = calculate_monthly_payment(principal, annual_interest_rate, term_years)
+    remaining_balance = npf.pv(monthly_interest_rate, number_of_payments - balloon_payments, -monthly_payment, 0)
+    return remaining_balance
+
+def optimize_terms(
+        listing_price,
+        min_down_payment_pct,
+        max_down_payment_pct,
+        min_interest_rate,
+        max_interest_rate,
+        rental_income,
+        monthly_expenses,
+        balloon_years,
+        balloon_adjustable=False,
+        required_seller_earnings_pct=5):
+    optimal_terms = None
+    target_cash_on_cash_return = 0.07  # 7%
+    required_seller_earnings = listing_price * (1 + required_seller_earnings_pct / 100)
+
+    def search_optimal_terms(balloon_years_range):
+        nonlocal optimal_terms, max_seller_earnings
+        for down_payment_pct in range(min_down_payment_pct, max_down_payment_pct + 1):
+            for interest_rate in range(min_interest_rate, max_interest_rate + 1):
+                for offer_price in range(int(listing_price * 0.8), listing_price + 1, 1000):
+                    for balloon_years in balloon_years_range:
+                        down_payment = offer_price * (down_payment_pct / 100)
+                        loan_amount = offer_price - down_payment
+                        monthly_payment = calculate_monthly_payment(loan_amount, interest_rate, 30)
+                        annual_cash_flow = (rental_income - monthly_payment - monthly_expenses) * 12
+                        initial_cash_investment = down_payment + (monthly_expenses * 12)
+                        cash_on_cash_return = annual_cash_flow / initial_cash_investment
+
+                        # Calculate total payments including balloon payment
+                        total_payments = (monthly_payment * balloon_years * 12) + calculate_balloon_payment(loan_amount, interest_rate, 30, balloon_years)
+                        seller_earnings = down_payment + total_payments
+
+                        if cash_on_cash_return >= target_cash_on_cash_return and seller_earnings >= required_seller_earnings:
+                            if seller_earnings > max_seller_earnings:
+                                max_seller_earnings = seller_earnings
+                                optimal_terms = {
+                                    'offer_price': round(offer_price),
+                                    'down_payment_pct': round(down_payment_pct),
+                                    'interest_rate': round(interest_rate, 4),
+                                    'monthly_payment': round(monthly_payment, 4),
+                                    'monthly_cash_flow': round(round(annual_cash_flow / 12), 4),
+                                    'cash_on_cash_return': round(cash_on_cash_return, 4),
+                                    'total_payments': round(total_payments, 4),
+                                    'seller_earnings': round(seller_earnings, 4),
+                                    'balloon_years': balloon_years
+                                }
+
+    # First, search with a fixed 5-year balloon period
+    max_seller_earnings = 0
+    search_optimal_terms([balloon_years])
+
+    # If no optimal terms found, search with flexible balloon period (5 to 10 years)
+    if (not optimal_terms) and (balloon_adjustable == True):
+        search_optimal_terms(range(5, 11))
+
+    return optimal_terms
@@ -0,0 +1,317 @@
+"""Benchmarks and performance regression gate for the calculators.
+
+    python -m benchmarks.run                      # run, compare with baseline.json
+    python -m benchmarks.run --update-baseline    # record a new baseline, in 3 processes
+    python -m benchmarks.run --quick -k best_terms
+
+Every case is first checked against benchmarks/reference.py, the original loop
+implementations: seller financing to within float tolerance, best terms exactly.
+High-rate, long-term seller financing cases run the reference loop in 60 digit
+decimal arithmetic, since in floats its recurrence is itself off by dollars there.
+Each case then reports latency percentiles, throughput and peak traced memory.
+Latency is the process's CPU time, so other processes sharing the machine do not
+count, and the run re-executes itself in a fixed PROCESS_ENV: set and dict order,
+and page faults that depend on what the allocator saw before a case, otherwise move
+these timings by a fifth to a half from one process to the next. The run fails if
+any check fails, or if a case's median latency or peak memory grows by more than
+--threshold over the baseline. Latency is compared relative to a fixed calibration
+workload timed next to each case, and only beyond the noise the runs themselves
+show (see compare); a case that looks slower is measured again in a fresh process,
+RECHECKS times at most, and fails only if it is slower every time. Baselines are machine specific;
+record one on the machine that runs the gate.
+
+Randomized reference checks (the solvers and engines against exhaustive or exact
+computations) are in benchmarks/checks.py: python -m benchmarks.checks.
+"""
+import argparse
+import decimal
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks import reference
+from creative_financing.best_terms import optimize_terms
+from creative_financing.seller_financing import seller_financing_calculator
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+# Changes smaller than these are timer and allocator noise, whatever the ratio
+NOISE_FLOOR = {'p50_ms': 0.25, 'peak_memory_kb': 64}
+# ...and a median moving by less than this many times its run's p90 - p50 spread,
+# taken from runs with enough repetitions to have one
+SPREAD_FACTOR = 3
+SPREAD_MIN_REPEAT = 10
+CALIBRATION_REPEAT = 21
+# Cases that look slower are measured again, each time in a new process since a
+# process can run slow throughout, and regress only if they do every time
+RECHECKS = 2
+# A baseline is recorded in this many processes: each case keeps the run with the
+# median p50, and how far the processes' p50s ranged
+BASELINE_PROCESSES = 3
+# Fixed set and dict order, and glibc malloc keeping freed memory rather than handing
+# it back to the OS, as it ends up doing in a long running server anyway
+PROCESS_ENV = {'PYTHONHASHSEED': '0', 'MALLOC_MMAP_THRESHOLD_': str(64 << 20), 'MALLOC_TRIM_THRESHOLD_': str(128 << 20)}
+
+
+####################################################
+#                      CASES                       #
+####################################################
+def precise(reference_func):
+    """reference_func on decimal amounts and rates at 60 digits.
+
+    The float loop carries each month's rounding error into the next balance times
+    (1 + r), so at high rates over long terms it drifts by dollars (by the whole
+    balance at 100% over 50 years) and is no reference for the closed form.
+    """
+    def wrapper(**kwargs):
+        with decimal.localcontext() as context:
+            context.prec = 60
+            return reference_func(**{k: decimal.Decimal(v) if k in ('sale_price', 'down_payment_rate', 'annual_interest_rate') else v for k, v in kwargs.items()})
+    return wrapper
+
+
+def seller_financing_cases():
+    options = {
+        'plain': {},
+        'balloon': {'balloon_due_years': 5},
+        'interest_only': {'interest_only_years': 2},
+        'balloon_interest_only': {'balloon_due_years': 5, 'interest_only_years': 1},
+    }
+    for term in (10, 30, 50):
+        for option, extra in options.items():
+            kwargs = dict(sale_price=400000, down_payment_rate=10, annual_interest_rate=5, loan_term_years=term, **extra)
+            yield 'seller_financing[term=%d,%s]' % (term, option), seller_financing_calculator, reference.seller_financing_calculator, kwargs, 200
+    # the page allows rates up to 100% and terms up to 50 years
+    for rate, term in ((25, 50), (50, 50), (100, 30), (100, 50)):
+        for option in ('plain', 'interest_only'):
+            kwargs = dict(sale_price=400000, down_payment_rate=10, annual_interest_rate=rate, loan_term_years=term, **options[option])
+            yield 'seller_financing[rate=%d,term=%d,%s]' % (rate, term, option), seller_financing_calculator, precise(reference.seller_financing_calculator), kwargs, 200
+
+
+def best_terms_cases():
+    deal = dict(listing_price=359900, rental_income=2000, monthly_expenses=630, required_seller_earnings_pct=5)
+    grids = {
+        # the 5 year pass finds nothing at these inputs, so the 5-10 year fallback runs
+        'default_fallback': dict(min_down_payment_pct=10, max_down_payment_pct=30, min_interest_rate=1, max_interest_rate=7, balloon_years=5, balloon_adjustable=True),
+        'default_fixed': dict(min_down_payment_pct=10, max_down_payment_pct=30, min_interest_rate=1, max_interest_rate=7, balloon_years=10, balloon_adjustable=False),
+        'narrow': dict(min_down_payment_pct=10, max_down_payment_pct=15, min_interest_rate=3, max_interest_rate=5, balloon_years=5, balloon_adjustable=True),
+        'wide_down_payment': dict(min_down_payment_pct=0, max_down_payment_pct=60, min_interest_rate=1, max_interest_rate=7, balloon_years=5, balloon_adjustable=True),
+        'wide_rate': dict(min_down_payment_pct=10, max_down_payment_pct=30, min_interest_rate=0, max_interest_rate=20, balloon_years=5, balloon_adjustable=True),
+    }
+    for grid, constraints in grids.items():
+        for method, repeat in (('loop', 1), ('grid', 20), ('pruned', 200), ('fine', 200)):
+            kwargs = dict(deal, **constraints, method=method)
+            if method == 'fine':
+                # whole percent steps, so the reference loop searches the same grid
+                kwargs.update(rate_step=1, down_payment_step=1)
+            yield 'best_terms[%s,%s]' % (grid, method), optimize_terms, reference.optimize_terms, kwargs, repeat
+
+
+def all_cases():
+    yield from seller_financing_cases()
+    yield from best_terms_cases()
+
+
+####################################################
+#                   FUNCTION                       #
+####################################################
+def check_equal(name, result, expected):
+    """Problems found comparing a result with the reference implementation, empty if none."""
+    if name.startswith('best_terms'):
+        return [] if result == expected else ['%r != reference %r' % (result, expected)]
+
+    problems = []
+    for key, value in expected.items():
+        if key == 'Amortization Table':
+            table = np.column_stack([np.asarray(v, dtype=float) for v in result[key].values()])
+            if table.shape != value.shape or not np.allclose(table, value.to_numpy(dtype=float), rtol=1e-9, atol=1e-6):
+                problems.append('amortization table differs from reference')
+        elif not np.isclose(result[key], float(value), rtol=1e-9, atol=1e-2):
+            problems.append('%s: %r != reference %r' % (key, result[key], value))
+    return problems
+
+
+def calibration_workload(values=np.random.default_rng(0).random(20000)):
+    # a fixed mix of interpreter and numpy work, about what the cases do
+    balance = 100000.0
+    for _ in range(360):
+        balance = balance * 1.004 - 600
+    np.sort(values)
+    return balance
+
+
+def calibrate():
+    """Fastest ms of calibration_workload, timed right before a case.
+
+    Comparing the cases with the baseline relative to this (measured on the same
+    machine, in the same minute) tells a slower case from a slower machine. The
+    fastest run is the machine's speed; a median of a few ms of work mostly tracks
+    whatever else ran in those ms.
+    """
+    latencies = []
+    for _ in range(CALIBRATION_REPEAT):
+        start = time.process_time()
+        calibration_workload()
+        latencies.append(time.process_time() - start)
+    return min(latencies) * 1000
+
+
+def measure(func, kwargs, repeat):
+    calibration_ms = calibrate()
+    func(**kwargs)
+    latencies = []
+    for _ in range(repeat):
+        start = time.process_time()
+        func(**kwargs)
+        latencies.append(time.process_time() - start)
+
+    tracemalloc.start()
+    func(**kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = np.array(latencies)
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    return {
+        'repeat': repeat,
+        'p50_ms': p50 * 1000,
+        'p90_ms': p90 * 1000,
+        'p99_ms': p99 * 1000,
+        'throughput_per_s': repeat / latencies.sum(),
+        'peak_memory_kb': peak / 1024,
+        'calibration_ms': calibration_ms,
+    }
+
+
+def run(pattern=None, quick=False, check=True, out=sys.stderr, names=None):
+    results = {}
+    for name, func, reference_func, kwargs, repeat in all_cases():
+        if pattern and pattern not in name or names is not None and name not in names:
+            continue
+        if quick:
+            repeat = max(min(repeat, 5), repeat // 10)
+        entry = measure(func, kwargs, repeat)
+        if check:
+            reference_kwargs = {k: v for k, v in kwargs.items() if k not in ('method', 'rate_step', 'down_payment_step')}
+            entry['problems'] = check_equal(name, func(**kwargs), reference_func(**reference_kwargs))
+        results[name] = entry
+        out.write('{:<55} p50 {:>9.3f} ms  p99 {:>9.3f} ms  {:>10.1f}/s  {:>9.0f} KB{}\n'.format(
+            name, entry['p50_ms'], entry['p99_ms'], entry['throughput_per_s'], entry['peak_memory_kb'], '  MISMATCH' if entry.get('problems') else ''))
+    return results
+
+
+def remeasure(names, quick):
+    """Results of the named cases, measured again in a new process."""
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, 'results.json')
+        # a baseline that does not exist: the new process only measures
+        command = [sys.executable, '-m', 'benchmarks.run', '--no-check', '--output', output, '--baseline', os.path.join(directory, 'baseline.json')]
+        command += ['--quick'] * quick + [argument for name in names for argument in ('--case', name)]
+        subprocess.run(command, check=True)
+        with open(output) as f:
+            return json.load(f)['cases']
+
+
+def baseline_cases(runs):
+    """One entry per case from several processes' results, see BASELINE_PROCESSES."""
+    cases = {}
+    for name in runs[0]:
+        entries = sorted((results[name] for results in runs), key=lambda entry: entry['p50_ms'])
+        cases[name] = dict(entries[len(entries) // 2], p50_range_ms=entries[-1]['p50_ms'] - entries[0]['p50_ms'])
+    return cases
+
+
+def compare(results, baseline, threshold):
+    """Regressions of results against baseline, as {case name: messages}.
+
+    Baseline latencies are scaled by how much slower the calibration workload ran
+    on this run than on the baseline's: the median over the cases of the ratio next
+    to each, since one case's calibration is itself a few noisy ms. Never scaled
+    down: the calibration running faster is more often its noise than a faster
+    machine, and baselines are recorded on the machine anyway. A latency change
+    must also clear SPREAD_FACTOR times the larger p90 - p50 spread of the two runs
+    (of those with SPREAD_MIN_REPEAT repetitions; fewer have no meaningful p90), and
+    the range of the baseline's p50 across processes, which a single run cannot show.
+    """
+    ratios = [entry['calibration_ms'] / baseline['cases'][name]['calibration_ms'] for name, entry in results.items()
+              if baseline.get('cases', {}).get(name, {}).get('calibration_ms') and entry.get('calibration_ms')]
+    scale = max(float(np.median(ratios)), 1.0) if ratios else 1.0
+    regressions = {}
+    for name, entry in results.items():
+        base = baseline.get('cases', {}).get(name)
+        if base is None:
+            continue
+        for metric, floor in NOISE_FLOOR.items():
+            expected = base[metric]
+            if metric == 'p50_ms':
+                expected *= scale
+                spreads = [measured['p90_ms'] - measured['p50_ms'] for measured in (base, entry) if measured['repeat'] >= SPREAD_MIN_REPEAT]
+                floor = max([floor, base.get('p50_range_ms', 0)] + [SPREAD_FACTOR * spread for spread in spreads])
+            if entry[metric] > expected * (1 + threshold) and entry[metric] - expected > floor:
+                regressions.setdefault(name, []).append('%s: %s %.3f vs baseline %.3f, %.3f expected on this run (+%.0f%%)' % (name, metric, entry[metric], base[metric], expected, (entry[metric] / expected - 1) * 100))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-k', dest='pattern', help='only run cases whose name contains this')
+    parser.add_argument('--case', dest='cases', action='append', help='only run this case, by its full name (repeatable)')
+    parser.add_argument('--quick', action='store_true', help='a tenth of the repetitions, at least 5')
+    parser.add_argument('--no-check', action='store_true', help='skip the equality checks against the reference')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown or memory growth, as a fraction (default 0.25)')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--output', help='also write the results as JSON here')
+    args = parser.parse_args(argv)
+    if any(name not in os.environ for name in PROCESS_ENV):
+        os.execve(sys.executable, [sys.executable, '-m', 'benchmarks.run'] + list(sys.argv[1:] if argv is None else argv), dict(PROCESS_ENV, **os.environ))
+
+    results = run(args.pattern, args.quick, not args.no_check, names=args.cases)
+    report = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cases': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    failed = ['%s: %s' % (name, problem) for name, entry in results.items() for problem in entry.get('problems', [])]
+    if args.update_baseline:
+        if failed:
+            sys.stderr.write('not updating the baseline, equality checks failed\n')
+        else:
+            runs = [results] + [remeasure(list(results), args.quick) for _ in range(BASELINE_PROCESSES - 1)]
+            report['cases'] = baseline_cases(runs)
+            with open(args.baseline, 'w') as f:
+                json.dump(report, f, indent=2)
+                f.write('\n')
+            sys.stderr.write('baseline written to %s\n' % args.baseline)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for _ in range(RECHECKS):
+            if not regressions:
+                break
+            sys.stderr.write('measuring again: %s\n' % ', '.join(regressions))
+            rerun = dict(results, **remeasure(regressions, args.quick))
+            regressions = {name: messages for name, messages in compare(rerun, baseline, args.threshold).items() if name in regressions}
+        failed += [message for messages in regressions.values() for message in messages]
+
+    for message in failed:
+        sys.stderr.write('FAIL %s\n' % message)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
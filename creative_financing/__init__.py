@@ -0,0 +1,32 @@
+"""Seller financing and best terms calculators, usable without Streamlit.
+
+The calculators need only numpy. Names are resolved from their submodules on first
+access, so importing the package or starting the CLI does not pay for numpy until a
+calculation actually runs.
+"""
+import importlib
+
+_EXPORTS = {
+    'seller_financing_calculator': 'creative_financing.seller_financing',
+    'calculate_monthly_payment': 'creative_financing.best_terms',
+    'calculate_balloon_payment': 'creative_financing.best_terms',
+    'optimize_terms': 'creative_financing.best_terms',
+    'terms_frontier': 'creative_financing.best_terms',
+    'seller_financing_summary': 'creative_financing.sweep',
+    'sensitivity_sweep': 'creative_financing.sweep',
+    'stress_test': 'creative_financing.stress',
+    'solve_terms': 'creative_financing.inverse',
+    'stacked_schedules': 'creative_financing.stack',
+    'cached_seller_financing_calculator': 'creative_financing.cache',
+    'cached_optimize_terms': 'creative_financing.cache',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
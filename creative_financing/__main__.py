@@ -0,0 +1,3 @@
+from creative_financing.cli import main
+
+main()
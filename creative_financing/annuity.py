@@ -0,0 +1,143 @@
+"""Precomputed compound growth table, memory-mapped and shared between processes.
+
+Monthly payment factors are built from (1 + r) ** n, raised with Python's float pow
+once per distinct rate so the array solvers agree with the scalar loop to the last
+bit (see best_terms.compound). That is an interpreter loop, which dominates when a
+search spans many distinct rates. The table holds the same powers for annual rates
+0-30% in 1/8 point steps and n = 0-600 months (terms up to 50 years, or any elapsed
+month within one), so a lookup gives exactly what the formula would; rates or months
+off the grid still go through the formula.
+
+power() is the scalar lookup used by calculate_monthly_payment (and through it
+calculate_balloon_payment and the loop search) and by seller_financing_calculator's
+payment. Remaining-balance factors stay on numpy's vectorized power: over the few balloon
+lengths in play it is faster than a gather, and it has to round like npf.pv.
+
+The table is off unless CREATIVE_FINANCING_ANNUITY_TABLE names a .npy file when this
+module is imported, or use_table(path) is called. A missing file is built on first
+use. It is opened with mmap_mode='r', so every process on the machine shares the
+same read-only pages.
+
+    python -m creative_financing annuity-table ~/.cache/annuity.npy
+    CREATIVE_FINANCING_ANNUITY_TABLE=~/.cache/annuity.npy streamlit run Intro.py
+"""
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+
+RATE_STEP = 0.125  # percent
+MAX_RATE = 30  # percent
+MAX_MONTHS = 600
+
+# Monthly rates of the grid, with the callers' own arithmetic so equality tests are exact
+RATES = np.arange(int(MAX_RATE / RATE_STEP) + 1) * RATE_STEP / 100 / 12
+
+# Read once: power() runs in the scalar calculators' inner loops, and with the table
+# off it costs one check of _table. Later changes go through use_table.
+_table_path = os.environ.get('CREATIVE_FINANCING_ANNUITY_TABLE') or None
+_UNLOADED = object()
+_table = None if _table_path is None else _UNLOADED
+_lock = threading.Lock()
+
+
+def build_table(path):
+    """Computes the table and writes it to path atomically; returns the path."""
+    months = list(range(MAX_MONTHS + 1))
+    table = np.array([[value ** m for m in months] for value in (1 + RATES).tolist()])
+
+    path = os.path.abspath(os.path.expanduser(path))
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # Write beside the target and rename, so no process ever maps a half written file
+    fd, tmp = tempfile.mkstemp(suffix='.npy', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, table)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return path
+
+
+def use_table(path):
+    """Turns the table on for this process and the worker processes it starts; None turns it off."""
+    global _table, _table_path
+    with _lock:
+        if path is None:
+            os.environ.pop('CREATIVE_FINANCING_ANNUITY_TABLE', None)
+        else:
+            os.environ['CREATIVE_FINANCING_ANNUITY_TABLE'] = path
+        _table_path = path or None
+        _table = None if _table_path is None else _UNLOADED
+
+
+def load_table():
+    """The memory-mapped table, or None when it is off."""
+    global _table
+    if _table is _UNLOADED:
+        with _lock:
+            if _table is _UNLOADED:
+                path = os.path.expanduser(_table_path)
+                if not os.path.exists(path):
+                    build_table(path)
+                table = np.load(path, mmap_mode='r')
+                if table.shape != (len(RATES), MAX_MONTHS + 1):
+                    # built with a different grid
+                    build_table(path)
+                    table = np.load(path, mmap_mode='r')
+                # a plain ndarray over the same mapped pages, indexing a memmap is slower
+                _table = np.asarray(table)
+    return _table
+
+
+def power(monthly_interest_rate, months):
+    """Scalar (1 + monthly_interest_rate) ** months, for the scalar calculators.
+
+    Read from the table when it is on and the inputs are on its grid; the table holds
+    the same Python float pow values, so the result is the same either way.
+    """
+    if _table is None:
+        return (1 + monthly_interest_rate) ** months
+    table = load_table()
+    # None if use_table(None) ran since the check above
+    if table is not None and 0 <= months <= MAX_MONTHS and months == int(months) and 0 <= monthly_interest_rate <= RATES[-1]:
+        i = round(monthly_interest_rate * (1200 / RATE_STEP))
+        if RATES[i] == monthly_interest_rate:
+            return float(table[i, int(months)])
+    return (1 + monthly_interest_rate) ** months
+
+
+def powers(monthly_interest_rate, months, formula):
+    """(1 + monthly_interest_rate) ** months, broadcast.
+
+    Elements on the table's grid are read from it; formula(rates, months) computes
+    the rest (and everything when the table is off) on 1-d arrays of those elements,
+    or with months a scalar when a scalar was given.
+    """
+    table = load_table()
+    if table is None:
+        return formula(monthly_interest_rate, months)
+
+    # Nearest grid point, clipped (fmin/fmax also send NaN to an end of the grid);
+    # out of range and off-grid values then fail the equality test
+    rate = np.asarray(monthly_interest_rate, dtype=float)
+    i = np.rint(rate * (1200 / RATE_STEP))
+    i = np.fmax(np.fmin(i, len(RATES) - 1, out=i), 0, out=i).astype(np.intp)
+    month = np.asarray(months, dtype=float)
+    m = np.fmax(np.fmin(month, MAX_MONTHS), 0).astype(np.intp)
+    on_grid = (RATES.take(i) == rate) & (m == month)
+
+    values = table.take(i * (MAX_MONTHS + 1) + m)
+    if on_grid.all():
+        return values
+    if on_grid.ndim == 0:
+        return formula(monthly_interest_rate, months)
+    off_grid = ~on_grid
+    rate, month = np.broadcast_arrays(rate, month)
+    values[off_grid] = formula(rate[off_grid], months if np.ndim(months) == 0 else month[off_grid])
+    return values
@@ -0,0 +1,248 @@
+"""Best terms, or inverse solves, for a whole file of listings.
+
+    python -m creative_financing.batch listings.csv best_terms.csv --workers 8
+    python -m creative_financing solve interest_rate monthly_cash_flow --input deals.csv --output rates.csv
+
+Each input row needs listing_price, rental_income and monthly_expenses. Any other
+optimize_terms argument can be given as a column to override the defaults for that
+row. Input columns are passed through and the best terms are appended as best_*
+columns, in input order. CSV and Parquet (with pyarrow installed) are supported on
+both sides, picked by file extension.
+
+solve_file runs inverse.solve_terms instead, one vectorized call per chunk, taking
+the target and the fixed terms from SOLVE_COLUMNS.
+"""
+import argparse
+import csv
+import math
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from creative_financing.best_terms import optimize_terms
+from creative_financing.inverse import solve_terms
+
+
+####################################################
+#                      PARAMS                      #
+####################################################
+# Same defaults as the Best Terms page
+DEFAULT_CONSTRAINTS = {
+    'min_down_payment_pct': 10,
+    'max_down_payment_pct': 30,
+    'min_interest_rate': 1,
+    'max_interest_rate': 7,
+    'balloon_years': 5,
+    'balloon_adjustable': True,
+    'required_seller_earnings_pct': 5,
+    'price_step': 1000,
+}
+REQUIRED_COLUMNS = ['listing_price', 'rental_income', 'monthly_expenses']
+INTEGER_COLUMNS = ['listing_price', 'min_down_payment_pct', 'max_down_payment_pct', 'min_interest_rate', 'max_interest_rate', 'balloon_years', 'price_step']
+TERMS_COLUMNS = ['offer_price', 'down_payment_pct', 'interest_rate', 'monthly_payment', 'monthly_cash_flow', 'cash_on_cash_return', 'total_payments', 'seller_earnings', 'balloon_years']
+RESULT_COLUMNS = ['best_' + c for c in TERMS_COLUMNS] + ['error']
+SOLVE_COLUMNS = ['target', 'offer_price', 'down_payment_pct', 'interest_rate', 'rental_income', 'monthly_expenses', 'balloon_years']
+
+
+####################################################
+#                   FUNCTION                       #
+####################################################
+def parse_listing(row, defaults=DEFAULT_CONSTRAINTS):
+    """optimize_terms keyword arguments for one input row; blank cells fall back to defaults."""
+    kwargs = dict(defaults)
+    for column in REQUIRED_COLUMNS + list(defaults):
+        value = row.get(column)
+        if value is None or value == '':
+            if column in REQUIRED_COLUMNS:
+                raise ValueError('missing %s' % column)
+            continue
+        if column == 'balloon_adjustable':
+            value = str(value).strip().lower() in ('1', 'true', 'yes', 'y')
+        else:
+            number = float(value)
+            # inf, and 1e400 which parses to it, would only fail deep in the search
+            if not math.isfinite(number):
+                raise ValueError('%s is not a finite number: %r' % (column, value))
+            value = int(number) if column in INTEGER_COLUMNS else number
+        kwargs[column] = value
+    return kwargs
+
+
+def best_terms_rows(rows, defaults=DEFAULT_CONSTRAINTS):
+    """Input rows with the best_* result columns filled in, errors reported per row."""
+    out = []
+    for row in rows:
+        result = dict.fromkeys(RESULT_COLUMNS)
+        try:
+            terms = optimize_terms(**parse_listing(row, defaults), method='pruned')
+        except (ValueError, TypeError, ArithmeticError) as e:
+            result['error'] = '%s: %s' % (type(e).__name__, e)
+        else:
+            if terms is not None:
+                for c in TERMS_COLUMNS:
+                    result['best_' + c] = terms[c] if isinstance(terms[c], int) else float(terms[c])
+        out.append({**row, **result})
+    return out
+
+
+def solve_rows(rows, solve_for, metric, defaults=None):
+    """Input rows with a solved_<solve_for> column; blank cells fall back to defaults, NaN if none."""
+    defaults = defaults or {}
+    columns = {}
+    for column in SOLVE_COLUMNS:
+        values = [row.get(column) for row in rows]
+        values = [defaults.get(column) if value is None or value == '' else value for value in values]
+        columns[column] = np.array([np.nan if value is None else float(value) for value in values])
+    target = columns.pop('target')
+    if solve_for in columns:
+        del columns[solve_for]
+    solved = solve_terms(solve_for, metric, target, **columns)
+    name = 'solved_' + solve_for
+    return [{**row, name: None if np.isnan(value) else value} for row, value in zip(rows, solved.tolist())]
+
+
+def _is_parquet(path):
+    return os.path.splitext(path)[1].lower() in ('.parquet', '.pq')
+
+
+def count_listings(path):
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    with open(path, 'rb') as f:
+        return max(0, sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(1 << 20), b'')) - 1)
+
+
+def read_listings(path, chunk_size):
+    """Yields lists of row dicts, chunk_size rows at a time."""
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pylist()
+        return
+    with open(path, newline='') as f:
+        chunk = []
+        for row in csv.DictReader(f):
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+class ListingsWriter:
+    """Appends result chunks to a CSV file, or to a Parquet file one row group per chunk."""
+
+    def __init__(self, path, result_columns=RESULT_COLUMNS):
+        self.path = path
+        self.result_columns = result_columns
+        self.parquet = _is_parquet(path)
+        self._file = None
+        self._writer = None
+
+    def write(self, rows):
+        if not rows:
+            return
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            if self._writer is None:
+                fields = [(c, pa.string()) for c in rows[0] if c not in self.result_columns]
+                fields += [(c, pa.string() if c == 'error' else pa.float64()) for c in self.result_columns]
+                self._schema = pa.schema(fields)
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            table = pa.Table.from_pylist([{k: (v if k in self.result_columns or v is None else str(v)) for k, v in row.items()} for row in rows], schema=self._schema)
+            self._writer.write_table(table)
+        else:
+            if self._writer is None:
+                self._file = open(self.path, 'w', newline='')
+                self._writer = csv.DictWriter(self._file, fieldnames=list(rows[0]))
+                self._writer.writeheader()
+            self._writer.writerows(rows)
+
+    def close(self):
+        if self.parquet and self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+
+
+def format_progress(done, total, started):
+    elapsed = time.monotonic() - started
+    rate = done / elapsed if elapsed > 0 else 0
+    eta = '{:.0f}s'.format((total - done) / rate) if rate and total else '?'
+    return '\r{:,}/{:,} listings  {:,.0f} listings/s  ETA {}'.format(done, total, rate, eta)
+
+
+def run_batch(input_path, output_path, workers=None, chunk_size=200, defaults=DEFAULT_CONSTRAINTS, progress=sys.stderr):
+    """Streams best terms for every listing in input_path to output_path, returns the row count.
+
+    At most two chunks per worker are in flight so memory stays bounded on any input size.
+    """
+    workers = workers or os.cpu_count() or 1
+    total = count_listings(input_path)
+    started = time.monotonic()
+    done = 0
+    writer = ListingsWriter(output_path)
+    pending = deque()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk in read_listings(input_path, chunk_size):
+                pending.append(pool.submit(best_terms_rows, chunk, defaults))
+                while len(pending) >= 2 * workers or (pending and pending[0].done()):
+                    rows = pending.popleft().result()
+                    writer.write(rows)
+                    done += len(rows)
+                    if progress:
+                        progress.write(format_progress(done, total, started))
+            while pending:
+                rows = pending.popleft().result()
+                writer.write(rows)
+                done += len(rows)
+                if progress:
+                    progress.write(format_progress(done, total, started))
+    finally:
+        writer.close()
+    if progress:
+        progress.write('\n')
+    return done
+
+
+def solve_file(input_path, output_path, solve_for, metric, defaults=None, chunk_size=10000):
+    """Streams solve_rows over every row of input_path to output_path, returns the row count."""
+    writer = ListingsWriter(output_path, ['solved_' + solve_for])
+    done = 0
+    try:
+        for chunk in read_listings(input_path, chunk_size):
+            writer.write(solve_rows(chunk, solve_for, metric, defaults))
+            done += len(chunk)
+    finally:
+        writer.close()
+    return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Best seller financing terms for every listing in a CSV or Parquet file.')
+    parser.add_argument('input', help='CSV or Parquet file of listings')
+    parser.add_argument('output', help='CSV or Parquet file to write')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: number of cores)')
+    parser.add_argument('--chunk-size', type=int, default=200, help='listings per task')
+    parser.add_argument('--quiet', action='store_true', help='no progress readout')
+    for name, value in DEFAULT_CONSTRAINTS.items():
+        if isinstance(value, bool):
+            parser.add_argument('--' + name.replace('_', '-'), type=lambda s: s.lower() in ('1', 'true', 'yes', 'y'), default=value)
+        else:
+            parser.add_argument('--' + name.replace('_', '-'), type=type(value), default=value)
+    args = parser.parse_args(argv)
+
+    defaults = {name: getattr(args, name) for name in DEFAULT_CONSTRAINTS}
+    run_batch(args.input, args.output, args.workers, args.chunk_size, defaults, None if args.quiet else sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
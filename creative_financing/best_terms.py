@@ -0,0 +1,528 @@
+import time
+
+import numpy as np
+
+from creative_financing import annuity, diagnostics
+
+
+TARGET_CASH_ON_CASH_RETURN = 0.07  # 7%
+METHODS = ('loop', 'grid', 'pruned', 'fine', 'anytime')
+
+
+def calculate_monthly_payment(principal, annual_interest_rate, term_years):
+    monthly_interest_rate = annual_interest_rate / 100 / 12
+    number_of_payments = term_years * 12
+    if monthly_interest_rate == 0:
+        return principal / number_of_payments
+    else:
+        growth = annuity.power(monthly_interest_rate, number_of_payments)
+        return principal * (monthly_interest_rate * growth) / (growth - 1)
+
+def calculate_balloon_payment(principal, annual_interest_rate, term_years, balloon_years):
+    # Present value of the payments left at the balloon, same arithmetic as npf.pv
+    monthly_payment = calculate_monthly_payment(principal, annual_interest_rate, term_years)
+    remaining_balance = calculate_balloon_payments(monthly_payment, annual_interest_rate, term_years, balloon_years)
+    return remaining_balance[()]
+
+def calculate_monthly_payments(principal, annual_interest_rate, term_years):
+    # Array version of calculate_monthly_payment, same arithmetic element by element
+    monthly_interest_rate = np.asarray(annual_interest_rate, dtype=float) / 100 / 12
+    number_of_payments = term_years * 12
+    growth = compound(monthly_interest_rate, number_of_payments)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        amortizing = principal * (monthly_interest_rate * growth) / (growth - 1)
+    return np.where(monthly_interest_rate == 0, principal / number_of_payments, amortizing)
+
+def calculate_balloon_payments(monthly_payment, annual_interest_rate, term_years, balloon_years):
+    # Array version of calculate_balloon_payment, takes the already computed payment
+    monthly_interest_rate = np.asarray(annual_interest_rate, dtype=float) / 100 / 12
+    remaining_payments = term_years * 12 - np.asarray(balloon_years) * 12
+    growth = np.power(1 + monthly_interest_rate, remaining_payments)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factor = np.where(monthly_interest_rate == 0, remaining_payments, (growth - 1) / monthly_interest_rate)
+    return monthly_payment * factor / growth
+
+def compound(monthly_interest_rate, number_of_payments):
+    # (1 + r) ** n using Python's float pow once per distinct rate. numpy's vectorized
+    # pow can differ in the last bit, and the array paths have to agree with the loop.
+    # With the annuity table on, rates on its grid are looked up instead.
+    return annuity.powers(monthly_interest_rate, number_of_payments, python_power)
+
+def python_power(monthly_interest_rate, number_of_payments):
+    values, inverse = np.unique(1 + monthly_interest_rate, return_inverse=True)
+    growth = np.array([value ** number_of_payments for value in values.tolist()])
+    return growth[inverse].reshape(np.shape(monthly_interest_rate))
+
+def evaluate_candidates(down_payment_pct, interest_rate, offer_price, rental_income, monthly_expenses):
+    # Buyer side of the loop body for broadcastable arrays of candidates
+    down_payment = offer_price * (down_payment_pct / 100)
+    loan_amount = offer_price - down_payment
+    monthly_payment = calculate_monthly_payments(loan_amount, interest_rate, 30)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cash_on_cash_return = ((rental_income - monthly_payment - monthly_expenses) * 12) / (down_payment + (monthly_expenses * 12))
+    return down_payment, monthly_payment, cash_on_cash_return
+
+def calculate_seller_earnings(down_payment, monthly_payment, interest_rate, balloon_years):
+    with diagnostics.stage('balloon_payments'):
+        balloon_payment = calculate_balloon_payments(monthly_payment, interest_rate, 30, balloon_years)
+    total_payments = (monthly_payment * balloon_years * 12) + balloon_payment
+    return down_payment + total_payments
+
+def search_terms_grid(down_payment_pcts, interest_rates, offer_prices, balloon_years_range, rental_income, monthly_expenses, target_cash_on_cash_return, required_seller_earnings, max_cells=2 ** 20):
+    """Evaluates every candidate with broadcasting, returns (seller_earnings, index) of the best one or None.
+
+    Axes are ordered like the nested loops so ties resolve to the same candidate.
+    """
+    down_payment_pcts = np.asarray(down_payment_pcts, dtype=float)
+    rate = np.asarray(interest_rates, dtype=float)[None, :, None, None]
+    price = np.asarray(offer_prices, dtype=float)[None, None, :, None]
+    balloon = np.asarray(balloon_years_range, dtype=float)[None, None, None, :]
+    best = None
+
+    # Chunk along the down payment axis to bound memory on wide ranges
+    chunk = max(1, max_cells // max(1, rate.size * price.size * balloon.size))
+    for start in range(0, len(down_payment_pcts), chunk):
+        pct = down_payment_pcts[start:start + chunk, None, None, None]
+        down_payment, monthly_payment, cash_on_cash_return = evaluate_candidates(pct, rate, price, rental_income, monthly_expenses)
+        seller_earnings = calculate_seller_earnings(down_payment, monthly_payment, rate, balloon)
+
+        feasible = (cash_on_cash_return >= target_cash_on_cash_return) & (seller_earnings >= required_seller_earnings)
+        masked = np.where(feasible, seller_earnings, -np.inf)
+        diagnostics.count('candidates', masked.size)
+        if diagnostics.enabled():
+            diagnostics.count('feasible', int(feasible.sum()))
+        i = int(np.argmax(masked))
+        if feasible.flat[i] and (best is None or masked.flat[i] > best[0]):
+            d, r, p, b = np.unravel_index(i, masked.shape)
+            best = (masked.flat[i], (start + d, r, p, b))
+    return best
+
+def best_offer_prices(down_payment_pcts, interest_rates, offer_prices, rental_income, monthly_expenses, target_cash_on_cash_return):
+    """Index of the highest offer price that meets the cash-on-cash target for each (down payment, rate), -1 if none.
+
+    Cash-on-cash falls as the offer price rises, so the feasible prices are a prefix of
+    offer_prices and its end has a closed form. The bound is checked against the exact
+    arithmetic one step either side so float rounding cannot move the boundary.
+    """
+    pct = np.asarray(down_payment_pcts, dtype=float)[:, None]
+    rate = np.asarray(interest_rates, dtype=float)[None, :]
+    if len(offer_prices) == 0:
+        return np.full((pct.size, rate.size), -1)
+
+    # Payment per dollar of loan, then solve cash_on_cash_return(price) = target for price
+    payment_factor = calculate_monthly_payments(1.0, rate, 30)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        max_price = 12 * (rental_income - monthly_expenses - target_cash_on_cash_return * monthly_expenses) / (12 * payment_factor * (1 - pct / 100) + target_cash_on_cash_return * pct / 100)
+        bound = np.floor((max_price - offer_prices.start) / offer_prices.step)
+    bound = np.clip(np.nan_to_num(bound, nan=-1, posinf=len(offer_prices), neginf=-1), -1, len(offer_prices)).astype(int)
+
+    window = np.clip(bound[..., None] + np.array([-1, 0, 1]), 0, len(offer_prices) - 1)
+    price = offer_prices.start + window * offer_prices.step
+    _, _, cash_on_cash_return = evaluate_candidates(pct[..., None], rate[..., None], price.astype(float), rental_income, monthly_expenses)
+    diagnostics.count('candidates', cash_on_cash_return.size)
+    return np.where(cash_on_cash_return >= target_cash_on_cash_return, window, -1).max(axis=-1)
+
+def search_terms_pruned(price_index, down_payment_pcts, interest_rates, offer_prices, balloon_years_range, rental_income, monthly_expenses, required_seller_earnings):
+    """Same contract as search_terms_grid, using the best offer price per (down payment, rate).
+
+    Seller earnings rise with the offer price, so only the highest feasible price needs
+    checking and the cost no longer depends on the number of price steps.
+    """
+    pct = np.asarray(down_payment_pcts, dtype=float)[:, None, None]
+    rate = np.asarray(interest_rates, dtype=float)[None, :, None]
+    balloon = np.asarray(balloon_years_range, dtype=float)[None, None, :]
+    if price_index.size == 0 or balloon.size == 0:
+        return None
+    price = (offer_prices.start + price_index * offer_prices.step)[..., None].astype(float)
+
+    down_payment, monthly_payment, _ = evaluate_candidates(pct, rate, price, rental_income, monthly_expenses)
+    seller_earnings = calculate_seller_earnings(down_payment, monthly_payment, rate, balloon)
+    feasible = (price_index[..., None] >= 0) & (seller_earnings >= required_seller_earnings)
+    masked = np.where(feasible, seller_earnings, -np.inf)
+    diagnostics.count('candidates', masked.size)
+    if diagnostics.enabled():
+        diagnostics.count('feasible', int(feasible.sum()))
+    i = int(np.argmax(masked))
+    if not feasible.flat[i]:
+        return None
+    d, r, b = np.unravel_index(i, masked.shape)
+    return (masked.flat[i], (d, r, price_index[d, r], b))
+
+def whole_number(value):
+    # fine grid values as the loop sees them: whole percents as ints, as from the other methods
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+def fine_grid(start, stop, step):
+    """start, start + step, ... up to stop inclusive."""
+    count = int(np.floor((stop - start) / step + 1e-9)) + 1 if stop >= start else 0
+    return np.round(start + np.arange(count, dtype=float) * step, 10)
+
+def smallest_down_payments(down_payment_pcts, interest_rates, offer_prices, rental_income, monthly_expenses, target_cash_on_cash_return):
+    """Index of the smallest down payment meeting the cash-on-cash target for each (rate, price), -1 if none.
+
+    For a fixed rate and price the target is linear in the down payment, so the smallest
+    one has a closed form; like best_offer_prices it is checked against the exact
+    arithmetic one grid step either side.
+    """
+    pcts = np.asarray(down_payment_pcts, dtype=float)
+    rate = np.asarray(interest_rates, dtype=float)[:, None]
+    price = np.asarray(offer_prices, dtype=float)[None, :]
+    step = pcts[1] - pcts[0] if len(pcts) > 1 else 1.0
+
+    # cash_on_cash_return >= target  <=>  x * price * (c - target) >= rhs, x the down payment fraction
+    c = 12 * calculate_monthly_payments(1.0, rate, 30)
+    rhs = c * price - 12 * (rental_income - monthly_expenses) + 12 * target_cash_on_cash_return * monthly_expenses
+    with np.errstate(divide='ignore', invalid='ignore'):
+        start = np.ceil((100 * rhs / (price * (c - target_cash_on_cash_return)) - pcts[0]) / step)
+    # At or below the target's payment rate a larger down payment never helps, try the smallest
+    start = np.where(c > target_cash_on_cash_return, np.nan_to_num(start, nan=0, posinf=len(pcts), neginf=0), 0)
+    start = np.clip(start, 0, len(pcts) - 1).astype(int)
+
+    window = np.clip(start[..., None] + np.array([-1, 0, 1]), 0, len(pcts) - 1)
+    _, _, cash_on_cash_return = evaluate_candidates(pcts[window], rate[..., None], price[..., None], rental_income, monthly_expenses)
+    diagnostics.count('candidates', cash_on_cash_return.size)
+    passing = cash_on_cash_return >= target_cash_on_cash_return
+    return np.where(passing.any(axis=-1), np.take_along_axis(window, passing.argmax(axis=-1)[..., None], -1)[..., 0], -1)
+
+def search_terms_fine(down_payment_pcts, interest_rates, offer_prices, balloon_years_range, rental_income, monthly_expenses, target_cash_on_cash_return, required_seller_earnings, max_cells=2 ** 20):
+    """Same contract as search_terms_grid for fine, evenly spaced down payment and rate grids.
+
+    Seller earnings fall as the down payment rises, so each (rate, price) only needs the
+    smallest down payment that meets the cash-on-cash target, and the cost does not
+    depend on the down payment resolution. Rates are searched by branch and bound: a
+    higher rate can only raise the smallest down payment and raises earnings per loan
+    dollar, so earnings between two rates are bounded by the lower rate's down payments
+    with the higher rate's earnings per dollar. Intervals whose bound cannot beat the
+    best so far are dropped, the rest are halved, so only a few rates are evaluated
+    however fine the rate grid.
+    """
+    best = None
+    for best, _, _ in search_rates(down_payment_pcts, interest_rates, offer_prices, balloon_years_range, rental_income, monthly_expenses, target_cash_on_cash_return, required_seller_earnings, max_cells=max_cells):
+        pass
+    return best
+
+def search_rates(down_payment_pcts, interest_rates, offer_prices, balloon_years_range, rental_income, monthly_expenses, target_cash_on_cash_return, required_seller_earnings, best_first=False, batch_size=4, max_cells=2 ** 20):
+    """The branch and bound of search_terms_fine, one step at a time.
+
+    Yields (best, upper_bound, resolved) after every round of evaluations: the best
+    candidate so far as in search_terms_grid, a bound on the seller earnings of any
+    candidate not yet ruled out (-inf once the search is proven), and the share of the
+    rate grid evaluated or ruled out. Breadth first halves every open interval each
+    round; best_first evaluates the batch_size intervals with the highest bounds, so
+    the best so far improves early and the search can stop at any yield. Each round's
+    rates are evaluated in chunks of at most max_cells candidates.
+    """
+    pcts = np.asarray(down_payment_pcts, dtype=float)
+    rates = np.asarray(interest_rates, dtype=float)
+    prices = np.asarray(offer_prices, dtype=float)
+    balloon = np.asarray(balloon_years_range, dtype=float)
+    if pcts.size == 0 or rates.size == 0 or prices.size == 0 or balloon.size == 0:
+        yield None, -np.inf, 1.0
+        return
+    evaluated = {}
+    best = None
+
+    # Chunk rates, and prices when one rate is too many, to bound memory at any price
+    # step; each (rate, price) takes the down payment window of 3, or one per balloon
+    width = max(3, balloon.size)
+    rate_chunk = max(1, max_cells // (width * prices.size))
+    price_chunk = max(1, max_cells // (width * rate_chunk))
+
+    def evaluate(indices):
+        nonlocal best
+        for start in range(0, len(indices), rate_chunk):
+            chunk = indices[start:start + rate_chunk]
+            rate = rates[chunk]
+            # Earnings per dollar of loan, for the bounds
+            earnings_per_dollar = calculate_seller_earnings(0.0, calculate_monthly_payments(1.0, rate[:, None], 30), rate[:, None], balloon)
+            down_payment_index = []
+            tops = []
+            for p in range(0, prices.size, price_chunk):
+                price = prices[p:p + price_chunk]
+                index = smallest_down_payments(pcts, rate, price, rental_income, monthly_expenses, target_cash_on_cash_return)
+                down_payment, monthly_payment, _ = evaluate_candidates(pcts[index][..., None], rate[:, None, None], price[None, :, None], rental_income, monthly_expenses)
+                seller_earnings = calculate_seller_earnings(down_payment, monthly_payment, rate[:, None, None], balloon)
+                feasible = (index[..., None] >= 0) & (seller_earnings >= required_seller_earnings)
+                masked = np.where(feasible, seller_earnings, -np.inf).reshape(len(chunk), -1)
+                diagnostics.count('candidates', masked.size)
+                top = masked.argmax(axis=1)
+                down_payment_index.append(index)
+                tops.append((p, masked[np.arange(len(chunk)), top], top, index))
+            down_payment_index = np.concatenate(down_payment_index, axis=1)
+            # rate by rate, prices in order, so ties go to the same candidate at any chunking
+            for n, r in enumerate(chunk.tolist()):
+                evaluated[r] = (down_payment_index[n], earnings_per_dollar[n])
+                for p, value, top, index in tops:
+                    if value[n] > -np.inf and (best is None or value[n] > best[0]):
+                        i, b = np.unravel_index(top[n], (index.shape[1], balloon.size))
+                        best = (value[n], (index[n, i], r, p + i, b))
+
+    def upper_bound(low, high):
+        down_payment_index, _ = evaluated[low]
+        _, earnings_per_dollar = evaluated[high]
+        x = np.where(down_payment_index >= 0, pcts[down_payment_index] / 100, np.nan)[:, None]
+        bound = prices[:, None] * (x + (1 - x) * earnings_per_dollar[None, :])
+        return np.nanmax(bound, initial=-np.inf)
+
+    def open_intervals(intervals):
+        # Keep intervals that could still beat the best (or reach the requirement); the
+        # slack covers rounding between the bound and the exact earnings
+        threshold = required_seller_earnings if best is None else best[0]
+        intervals = [(bound, low, high) for bound, low, high in intervals if high - low > 1 and bound * (1 + 1e-9) >= threshold]
+        # only the open intervals' ends are needed again, each holds a price's worth of state
+        ends = {r for _, low, high in intervals for r in (low, high)}
+        for r in [r for r in evaluated if r not in ends]:
+            del evaluated[r]
+        return intervals
+
+    def progress(intervals):
+        unresolved = sum(high - low - 1 for _, low, high in intervals)
+        return best, max((bound for bound, _, _ in intervals), default=-np.inf), 1 - unresolved / len(rates)
+
+    # The ends of the rate grid bound everything between them; the top end, which earns
+    # the most per loan dollar, usually gives the first best so far
+    evaluate(np.unique([len(rates) - 1, 0]))
+    intervals = open_intervals([(upper_bound(0, len(rates) - 1), 0, len(rates) - 1)] if len(rates) > 2 else [])
+    yield progress(intervals)
+    while intervals:
+        if best_first:
+            intervals.sort(reverse=True)
+            batch, intervals = intervals[:batch_size], intervals[batch_size:]
+        else:
+            batch, intervals = intervals, []
+        middles = np.array([(low + high) // 2 for _, low, high in batch])
+        evaluate(middles)
+        for (_, low, high), middle in zip(batch, middles.tolist()):
+            intervals += [(upper_bound(a, b), a, b) for a, b in ((low, middle), (middle, high)) if b - a > 1]
+        intervals = open_intervals(intervals)
+        yield progress(intervals)
+
+def optimize_terms(
+        listing_price, 
+        min_down_payment_pct, 
+        max_down_payment_pct, 
+        min_interest_rate, 
+        max_interest_rate, 
+        rental_income, 
+        monthly_expenses, 
+        balloon_years, 
+        balloon_adjustable=False, 
+        required_seller_earnings_pct=5,
+        method='grid',
+        price_step=1000,
+        rate_step=0.125,
+        down_payment_step=0.01,
+        time_budget=None,
+        on_progress=None,
+        should_stop=None):
+    # method 'fine' treats rates and down payments as real valued, to rate_step and
+    # down_payment_step (both in percent) instead of whole percents.
+    # method 'anytime' runs the same search best first and can stop early: after
+    # time_budget seconds, or once should_stop() is true. on_progress(report) is called
+    # each time the bound tightens; the terms found get 'proven_optimal' and
+    # 'earnings_gap', the most the seller earnings could still be short by. Stopped
+    # before any terms were found, it returns no terms but {'proven_optimal': False,
+    # 'upper_bound': ...}, the most any terms could earn the seller with the fixed
+    # balloon; None always means no terms meet the constraints.
+    if method not in METHODS:
+        raise ValueError('unknown method %r, expected one of %s' % (method, ', '.join(METHODS)))
+    optimal_terms = None
+    target_cash_on_cash_return = TARGET_CASH_ON_CASH_RETURN
+    required_seller_earnings = listing_price * (1 + required_seller_earnings_pct / 100)
+    if method in ('fine', 'anytime'):
+        down_payment_pcts = fine_grid(min_down_payment_pct, max_down_payment_pct, down_payment_step)
+        interest_rates = fine_grid(min_interest_rate, max_interest_rate, rate_step)
+    else:
+        down_payment_pcts = range(min_down_payment_pct, max_down_payment_pct + 1)
+        interest_rates = range(min_interest_rate, max_interest_rate + 1)
+    offer_prices = range(int(listing_price * 0.8), listing_price + 1, price_step)
+    
+    def search_optimal_terms_loop(balloon_years_range, down_payment_pcts, interest_rates, offer_prices):
+        nonlocal optimal_terms, max_seller_earnings
+        for down_payment_pct in down_payment_pcts:
+            for interest_rate in interest_rates:
+                for offer_price in offer_prices:
+                    for balloon_years in balloon_years_range:
+                        down_payment = offer_price * (down_payment_pct / 100)
+                        loan_amount = offer_price - down_payment
+                        monthly_payment = calculate_monthly_payment(loan_amount, interest_rate, 30)
+                        annual_cash_flow = (rental_income - monthly_payment - monthly_expenses) * 12
+                        initial_cash_investment = down_payment + (monthly_expenses * 12)
+                        cash_on_cash_return = annual_cash_flow / initial_cash_investment
+
+                        # Calculate total payments including balloon payment
+                        total_payments = (monthly_payment * balloon_years * 12) + calculate_balloon_payment(loan_amount, interest_rate, 30, balloon_years)
+                        seller_earnings = down_payment + total_payments
+
+                        if cash_on_cash_return >= target_cash_on_cash_return and seller_earnings >= required_seller_earnings:
+                            if seller_earnings > max_seller_earnings:
+                                max_seller_earnings = seller_earnings
+                                optimal_terms = {
+                                    'offer_price': round(offer_price),
+                                    'down_payment_pct': round(down_payment_pct, 4),
+                                    'interest_rate': round(interest_rate, 4),
+                                    'monthly_payment': round(monthly_payment, 4),
+                                    'monthly_cash_flow': round(round(annual_cash_flow / 12), 4),
+                                    'cash_on_cash_return': round(cash_on_cash_return, 4),
+                                    'total_payments': round(total_payments, 4),
+                                    'seller_earnings': round(seller_earnings, 4),
+                                    'balloon_years': balloon_years
+                                }
+
+    def search_optimal_terms(balloon_years_range):
+        if method == 'loop':
+            diagnostics.count('candidates', len(down_payment_pcts) * len(interest_rates) * len(offer_prices) * len(balloon_years_range))
+            search_optimal_terms_loop(balloon_years_range, down_payment_pcts, interest_rates, offer_prices)
+            return
+        if method == 'anytime':
+            search_anytime(balloon_years_range)
+            return
+        if method == 'fine':
+            best = search_terms_fine(down_payment_pcts, interest_rates, offer_prices, balloon_years_range, rental_income, monthly_expenses, target_cash_on_cash_return, required_seller_earnings)
+        elif method == 'pruned':
+            best = search_terms_pruned(price_index, down_payment_pcts, interest_rates, offer_prices, balloon_years_range, rental_income, monthly_expenses, required_seller_earnings)
+        else:
+            best = search_terms_grid(down_payment_pcts, interest_rates, offer_prices, balloon_years_range, rental_income, monthly_expenses, target_cash_on_cash_return, required_seller_earnings)
+        if best is not None:
+            # Re-run the winner through the scalar loop so the result matches it exactly
+            d, r, p, b = best[1]
+            down_payment_pct, interest_rate = down_payment_pcts[d], interest_rates[r]
+            if method == 'fine':
+                down_payment_pct, interest_rate = whole_number(down_payment_pct), whole_number(interest_rate)
+            search_optimal_terms_loop([balloon_years_range[b]], [down_payment_pct], [interest_rate], [offer_prices[p]])
+
+    def search_anytime(balloon_years_range):
+        nonlocal stopped, upper_bound
+        winner = None
+        for best, bound, resolved in search_rates(down_payment_pcts, interest_rates, offer_prices, balloon_years_range, rental_income, monthly_expenses, target_cash_on_cash_return, required_seller_earnings, best_first=True):
+            if best is not None and best[1] != winner:
+                winner = d, r, p, b = best[1]
+                down_payment_pct, interest_rate = whole_number(down_payment_pcts[d]), whole_number(interest_rates[r])
+                search_optimal_terms_loop([balloon_years_range[b]], [down_payment_pct], [interest_rate], [offer_prices[p]])
+            upper_bound = bound
+            elapsed = time.monotonic() - started
+            if on_progress is not None:
+                on_progress({
+                    'terms': optimal_terms,
+                    'upper_bound': max(bound, max_seller_earnings) if optimal_terms else bound,
+                    'resolved': resolved,
+                    'elapsed': elapsed,
+                    'balloon_fallback': len(balloon_years_range) > 1,
+                    'done': bound == -np.inf,
+                })
+            if bound > -np.inf and ((time_budget is not None and elapsed >= time_budget) or (should_stop is not None and should_stop())):
+                stopped = True
+                return
+
+    started = time.monotonic()
+    stopped = False
+    upper_bound = -np.inf
+
+    # The cash-on-cash bound does not depend on the balloon, so both passes share it
+    if method == 'pruned':
+        with diagnostics.stage('price_bound'):
+            price_index = best_offer_prices(down_payment_pcts, interest_rates, offer_prices, rental_income, monthly_expenses, target_cash_on_cash_return)
+
+    # First, search with a fixed 5-year balloon period
+    max_seller_earnings = 0
+    with diagnostics.stage('search_fixed_balloon'):
+        search_optimal_terms([balloon_years])
+
+    # If no optimal terms found, search with flexible balloon period (5 to 10 years)
+    if (not optimal_terms) and (balloon_adjustable == True) and not stopped:
+        diagnostics.flag('balloon_fallback')
+        with diagnostics.stage('search_balloon_fallback'):
+            search_optimal_terms(range(5, 11))
+
+    if method == 'anytime' and optimal_terms:
+        optimal_terms['proven_optimal'] = not stopped
+        optimal_terms['earnings_gap'] = round(max(upper_bound - max_seller_earnings, 0), 4) if stopped else 0
+    elif method == 'anytime' and stopped:
+        # out of time, not infeasible (and the balloon fallback never ran)
+        return {'proven_optimal': False, 'upper_bound': round(float(upper_bound), 4)}
+    return optimal_terms
+
+def skyline(cash_on_cash_return, seller_earnings):
+    """Mask of the points no other point beats on both cash-on-cash and seller earnings.
+
+    Sort by earnings (best first, higher cash-on-cash breaking ties) and keep each point
+    whose cash-on-cash beats everything before it: O(n log n) instead of pairwise.
+    Exact duplicates keep their first occurrence.
+    """
+    order = np.lexsort((-cash_on_cash_return, -seller_earnings))
+    best_before = np.maximum.accumulate(np.concatenate(([-np.inf], cash_on_cash_return[order][:-1])))
+    keep = np.zeros(len(order), dtype=bool)
+    keep[order] = cash_on_cash_return[order] > best_before
+    return keep
+
+def terms_frontier(
+        listing_price,
+        min_down_payment_pct,
+        max_down_payment_pct,
+        min_interest_rate,
+        max_interest_rate,
+        rental_income,
+        monthly_expenses,
+        balloon_years,
+        balloon_adjustable=False,
+        required_seller_earnings_pct=5,
+        price_step=1000,
+        max_cells=2 ** 20):
+    """Tradeoff between buyer cash-on-cash and seller earnings, instead of the single optimum.
+
+    Takes optimize_terms' constraints and balloon rule: candidates with the fixed balloon,
+    and only if none of them is feasible and balloon_adjustable, the 5-10 year balloons
+    ('balloon_fallback' says which). Returns columns of arrays for the candidates on the
+    frontier of their down payment %, so each down payment is a counter-offer variant;
+    'overall' marks the points that are also on the frontier across all down payments.
+    The optimize_terms result (method 'loop', 'grid' or 'pruned') has the earnings of the
+    highest-earnings point of the overall frontier.
+    """
+    required_seller_earnings = listing_price * (1 + required_seller_earnings_pct / 100)
+    rate = np.arange(min_interest_rate, max_interest_rate + 1, dtype=float)[:, None, None]
+    prices = np.arange(int(listing_price * 0.8), listing_price + 1, price_step, dtype=float)
+
+    def search(balloon_years_range):
+        # One down payment at a time gives each variant's frontier directly; prices are
+        # chunked to max_cells so memory stays bounded at any price step
+        balloon = np.array(balloon_years_range, dtype=float)[None, None, :]
+        chunk = max(1, max_cells // (rate.size * balloon.size))
+        columns = {k: [] for k in ('offer_price', 'down_payment_pct', 'interest_rate', 'balloon_years', 'monthly_payment', 'cash_on_cash_return', 'seller_earnings')}
+        for down_payment_pct in range(min_down_payment_pct, max_down_payment_pct + 1):
+            variant = {k: [] for k in columns if k != 'down_payment_pct'}
+            for start in range(0, len(prices), chunk):
+                price = prices[start:start + chunk, None][None]
+                shape = np.broadcast_shapes(rate.shape, price.shape, balloon.shape)
+                down_payment, monthly_payment, cash_on_cash_return = evaluate_candidates(float(down_payment_pct), rate, price, rental_income, monthly_expenses)
+                seller_earnings = calculate_seller_earnings(down_payment, monthly_payment, rate, balloon)
+                feasible = np.broadcast_to((cash_on_cash_return >= TARGET_CASH_ON_CASH_RETURN), shape) & (seller_earnings >= required_seller_earnings)
+                if not feasible.any():
+                    continue
+                candidates = {
+                    'offer_price': np.broadcast_to(price, shape)[feasible],
+                    'interest_rate': np.broadcast_to(rate, shape)[feasible],
+                    'balloon_years': np.broadcast_to(balloon, shape)[feasible],
+                    'monthly_payment': np.broadcast_to(monthly_payment, shape)[feasible],
+                    'cash_on_cash_return': np.broadcast_to(cash_on_cash_return, shape)[feasible],
+                    'seller_earnings': seller_earnings[feasible],
+                }
+                # the frontier of the chunks' frontiers is the variant's frontier
+                keep = skyline(candidates['cash_on_cash_return'], candidates['seller_earnings'])
+                for k, v in candidates.items():
+                    variant[k].append(v[keep])
+            if not variant['offer_price']:
+                continue
+            variant = {k: np.concatenate(v) for k, v in variant.items()}
+            keep = skyline(variant['cash_on_cash_return'], variant['seller_earnings'])
+            for k, v in variant.items():
+                columns[k].append(v[keep])
+            columns['down_payment_pct'].append(np.full(keep.sum(), down_payment_pct))
+        return {k: np.concatenate(v) if v else np.array([]) for k, v in columns.items()}
+
+    frontier = search([balloon_years])
+    frontier['balloon_fallback'] = False
+    if len(frontier['offer_price']) == 0 and balloon_adjustable == True:
+        frontier = dict(search(range(5, 11)), balloon_fallback=True)
+    frontier['overall'] = skyline(frontier['cash_on_cash_return'], frontier['seller_earnings'])
+    return frontier
@@ -0,0 +1,203 @@
+"""Process-wide memoization for the calculators.
+
+Every Streamlit session runs in the same process, so one bounded LRU cache serves
+all of them. A session keeps only the key returned by ``.key(...)`` and looks the
+result up on each rerun; if the entry was evicted in the meantime it is recomputed
+from the inputs stored in the key.
+
+    result = cached_optimize_terms(listing_price=359900, ...)
+    key = cached_seller_financing_calculator.key(400000, 10, 5, 30, 5, 1)
+    result = cached_seller_financing_calculator.lookup(key)
+
+On a miss, lookup(key, compute=...) computes with compute instead of the wrapped
+function, given the same arguments; the Seller Financing page passes an
+IncrementalSchedule of its previous key's inputs there, whose state lives in this
+cache too.
+
+The cap defaults to 64 MB and can be set with CREATIVE_FINANCING_CACHE_MB or
+``CACHE.resize``. Cached arrays are made read-only because every caller shares them;
+the dicts and lists around them are copied for each caller (see _copy), so a session
+changing a result it got does not change it for the others.
+"""
+import functools
+import inspect
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from creative_financing import diagnostics
+from creative_financing.best_terms import optimize_terms, terms_frontier
+from creative_financing.seller_financing import seller_financing_calculator
+
+
+_MISSING = object()
+
+
+def sizeof(value):
+    """Approximate memory held by a result: array buffers plus container overhead."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes + 112
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(k) + sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def _freeze(value):
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, dict):
+        for v in value.values():
+            _freeze(v)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            _freeze(v)
+    return value
+
+
+def _copy(value):
+    # New containers around the same (read-only) arrays and immutable scalars: a few
+    # microseconds for a calculator result, where a deep copy would copy the arrays
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_copy(v) for v in value)
+    return value
+
+
+class ResultCache:
+    """Thread-safe LRU cache bounded by the approximate size of its values."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return _copy(entry[0])
+
+    def put(self, key, value, size=None):
+        """Caches value and returns a copy of it; the caller's value is kept apart too."""
+        # size, when the caller knows it, saves walking value with sizeof
+        size = sizeof(value) if size is None else size
+        if size > self.max_bytes:
+            return value
+        stored = _copy(_freeze(value))
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self._entries[key] = (stored, size)
+            self.size += size
+            self._evict()
+        return _copy(stored)
+
+    def resize(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def _evict(self):
+        while self.size > self.max_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.size -= size
+            self.evictions += 1
+
+
+CACHE = ResultCache(int(float(os.environ.get('CREATIVE_FINANCING_CACHE_MB', 64)) * 2 ** 20))
+
+
+def _normalize_value(value):
+    # 10, 10.0 and np.int64(10) are the same input; whole floats become ints so
+    # the recomputed call still works with range()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def memoize(func, normalize=None, cache=CACHE):
+    """Wraps func so results are shared through cache, keyed on its normalized arguments.
+
+    normalize, if given, maps the bound keyword arguments to a canonical form, for
+    inputs that are different values but mean the same thing.
+    """
+    signature = inspect.signature(func)
+    name = '%s.%s' % (func.__module__, func.__qualname__)
+
+    def key(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = {k: _normalize_value(v) for k, v in bound.arguments.items()}
+        if normalize is not None:
+            arguments = normalize(arguments)
+        return (name, tuple(sorted(arguments.items())))
+
+    def lookup(key, compute=None):
+        result = cache.get(key, _MISSING)
+        if result is _MISSING:
+            diagnostics.count('cache_misses')
+            with diagnostics.stage('compute[%s]' % func.__name__):
+                result = cache.put(key, (compute or func)(**dict(key[1])))
+        else:
+            diagnostics.count('cache_hits')
+        return result
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return lookup(key(*args, **kwargs))
+
+    wrapper.key = key
+    wrapper.lookup = lookup
+    wrapper.cache = cache
+    return wrapper
+
+
+def _normalize_seller_financing(arguments):
+    # No balloon and no interest-only period can be given as None or 0
+    arguments['balloon_due_years'] = arguments['balloon_due_years'] or None
+    arguments['interest_only_years'] = arguments['interest_only_years'] or None
+    return arguments
+
+
+cached_seller_financing_calculator = memoize(seller_financing_calculator, _normalize_seller_financing)
+cached_optimize_terms = memoize(optimize_terms)
+cached_terms_frontier = memoize(terms_frontier)
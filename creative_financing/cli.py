@@ -0,0 +1,200 @@
+"""Command line entry point: python -m creative_financing <command> ...
+
+    seller-financing   schedule summary for one loan, as JSON
+    best-terms         optimize_terms for one listing, as JSON
+    stress             Monte Carlo stress test of one listing's best terms
+    solve              offer price, rate or down payment that hits a target
+    batch              best terms for a CSV/Parquet file of listings
+    schedules          exact schedules for a file of deals, to Parquet/Arrow
+    serve              local HTTP/JSON API with request batching
+    annuity-table      build the shared compound growth table
+
+Calculator modules are imported only once a command runs, so --help is instant.
+"""
+import argparse
+import json
+import os
+import sys
+
+
+def to_json(value):
+    """numpy scalars and arrays as plain Python values."""
+    if isinstance(value, dict):
+        return {k: to_json(v) for k, v in value.items()}
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return value
+
+
+def seller_financing(args):
+    from creative_financing.seller_financing import seller_financing_calculator
+    result = seller_financing_calculator(args.sale_price, args.down_payment_rate, args.interest_rate, args.loan_term_years, args.balloon_years, args.interest_only_years, exact=args.exact)
+    if not args.table:
+        del result['Amortization Table']
+    return result
+
+
+def best_terms(args):
+    from creative_financing.best_terms import optimize_terms
+    return optimize_terms(
+        listing_price=args.listing_price,
+        min_down_payment_pct=args.min_down_payment_pct,
+        max_down_payment_pct=args.max_down_payment_pct,
+        min_interest_rate=args.min_interest_rate,
+        max_interest_rate=args.max_interest_rate,
+        rental_income=args.rental_income,
+        monthly_expenses=args.monthly_expenses,
+        balloon_years=args.balloon_years,
+        balloon_adjustable=args.balloon_adjustable,
+        required_seller_earnings_pct=args.required_seller_earnings_pct,
+        method=args.method,
+        price_step=args.price_step,
+        rate_step=args.rate_step,
+        down_payment_step=args.down_payment_step,
+        time_budget=args.time_budget,
+    )
+
+
+def stress(args):
+    from creative_financing.stress import stress_test
+    terms = best_terms(args)
+    if terms is None:
+        return {'error': 'no terms meet the constraints'}
+    if 'offer_price' not in terms:
+        return {'error': 'no terms found within the time budget', 'upper_bound': terms['upper_bound']}
+    result = stress_test(terms, args.rental_income, args.monthly_expenses, scenarios=args.scenarios, seed=args.seed, workers=args.workers, distributions={
+        'rent': {'kind': 'normal', 'mean': args.rental_income, 'std': args.rental_income * args.rent_volatility_pct / 100},
+        'expenses': {'kind': 'lognormal', 'mean': args.monthly_expenses, 'std': args.monthly_expenses * args.expense_volatility_pct / 100},
+        'refinance_rate': {'kind': 'normal', 'mean': terms['interest_rate'] + args.refinance_spread, 'std': args.refinance_volatility},
+    })
+    for name in ('cash_on_cash_return', 'cash_on_cash_after_refinance'):
+        del result[name]['histogram']
+    return dict(result, terms=terms)
+
+
+def solve(args):
+    from creative_financing import batch
+    from creative_financing.inverse import solve_terms
+    given = {name: getattr(args, name) for name in batch.SOLVE_COLUMNS[1:] if name != args.solve_for}
+    if args.input:
+        if not args.output:
+            raise SystemExit('--output is required with --input')
+        defaults = {name: value for name, value in given.items() if value is not None}
+        if args.target is not None:
+            defaults['target'] = args.target[0]
+        return {'rows': batch.solve_file(args.input, args.output, args.solve_for, args.metric, defaults), 'output': args.output}
+    if args.target is None:
+        raise SystemExit('--target is required without --input')
+    try:
+        solved = solve_terms(args.solve_for, args.metric, args.target, **given)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    return {'target': args.target, args.solve_for: [None if v != v else v for v in solved.tolist()]}
+
+
+def schedules(args):
+    from creative_financing.export import export_schedules
+    deals, rows = export_schedules(args.input, args.output, args.chunk_size)
+    return {'deals': deals, 'rows': rows, 'output': args.output}
+
+
+def annuity_table(args):
+    from creative_financing.annuity import build_table
+    path = build_table(args.path)
+    return {'path': path, 'bytes': os.path.getsize(path), 'use_with': 'CREATIVE_FINANCING_ANNUITY_TABLE=%s' % path}
+
+
+def number(text):
+    """Whole numbers as int, so the whole percent methods can range() over them."""
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+def add_best_terms_arguments(parser):
+    parser.add_argument('--listing-price', type=int, default=359900)
+    parser.add_argument('--rental-income', type=float, default=2000)
+    parser.add_argument('--monthly-expenses', type=float, default=630)
+    parser.add_argument('--min-down-payment-pct', type=number, default=10)
+    parser.add_argument('--max-down-payment-pct', type=number, default=30)
+    parser.add_argument('--min-interest-rate', type=number, default=1)
+    parser.add_argument('--max-interest-rate', type=number, default=7)
+    parser.add_argument('--balloon-years', type=int, default=5)
+    parser.add_argument('--balloon-adjustable', action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument('--required-seller-earnings-pct', type=float, default=5)
+    parser.add_argument('--method', choices=['loop', 'grid', 'pruned', 'fine', 'anytime'], default='pruned')
+    parser.add_argument('--price-step', type=int, default=1000)
+    parser.add_argument('--rate-step', type=float, default=0.125, help='interest rate resolution in percent, with --method fine')
+    parser.add_argument('--down-payment-step', type=float, default=0.01, help='down payment resolution in percent, with --method fine')
+    parser.add_argument('--time-budget', type=float, default=None, help='seconds, with --method anytime; the result says if it is proven optimal')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m creative_financing', description='Creative financing calculators.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    sf = commands.add_parser('seller-financing', help='schedule summary for one seller financed loan')
+    sf.add_argument('--sale-price', type=float, default=400000)
+    sf.add_argument('--down-payment-rate', type=float, default=10)
+    sf.add_argument('--interest-rate', type=float, default=5)
+    sf.add_argument('--loan-term-years', type=int, default=30)
+    sf.add_argument('--balloon-years', type=int, default=None)
+    sf.add_argument('--interest-only-years', type=int, default=0)
+    sf.add_argument('--table', action='store_true', help='include the amortization table')
+    sf.add_argument('--exact', action='store_true', help='amounts in integer CENTS, not dollars, that tie out to the cent')
+    sf.set_defaults(run=seller_financing)
+
+    bt = commands.add_parser('best-terms', help='best offer terms for one listing')
+    add_best_terms_arguments(bt)
+    bt.set_defaults(run=best_terms)
+
+    mc = commands.add_parser('stress', help="Monte Carlo stress test of one listing's best terms")
+    add_best_terms_arguments(mc)
+    mc.add_argument('--scenarios', type=int, default=1000000)
+    mc.add_argument('--seed', type=int, default=0)
+    mc.add_argument('--workers', type=int, default=None, help='worker processes (default: number of cores)')
+    mc.add_argument('--rent-volatility-pct', type=float, default=10)
+    mc.add_argument('--expense-volatility-pct', type=float, default=15)
+    mc.add_argument('--refinance-spread', type=float, default=2, help="mean refinance rate above the seller's rate, in points")
+    mc.add_argument('--refinance-volatility', type=float, default=1.5)
+    mc.set_defaults(run=stress)
+
+    sv = commands.add_parser('solve', help='offer price, interest rate or down payment that hits a target')
+    sv.add_argument('solve_for', choices=['offer_price', 'interest_rate', 'down_payment_pct'])
+    sv.add_argument('metric', choices=['monthly_payment', 'monthly_cash_flow', 'cash_on_cash_return', 'balloon_amount'])
+    sv.add_argument('--target', type=float, nargs='+', help='one or more targets; cash_on_cash_return as a fraction')
+    sv.add_argument('--offer-price', type=float)
+    sv.add_argument('--down-payment-pct', type=float)
+    sv.add_argument('--interest-rate', type=float)
+    sv.add_argument('--rental-income', type=float, default=0)
+    sv.add_argument('--monthly-expenses', type=float, default=0)
+    sv.add_argument('--balloon-years', type=float, default=5)
+    sv.add_argument('--input', help='CSV or Parquet file with a target column and any of the term columns, which override the flags')
+    sv.add_argument('--output', help='CSV or Parquet file to write, with a solved_<solve_for> column')
+    sv.set_defaults(run=solve)
+
+    sc = commands.add_parser('schedules', help='exact amortization schedules for a file of deals, to one Parquet or Arrow file')
+    sc.add_argument('input', help='CSV or Parquet file with deal_id, sale_price, down_payment_rate, annual_interest_rate, loan_term_years and optionally balloon_due_years, interest_only_years')
+    sc.add_argument('output', help='.parquet, or .arrow/.feather for a memory-mappable file')
+    sc.add_argument('--chunk-size', type=int, default=1000, help='deals per row group')
+    sc.set_defaults(run=schedules)
+
+    at = commands.add_parser('annuity-table', help='build the memory-mapped compound growth table')
+    at.add_argument('path', help='.npy file to write')
+    at.set_defaults(run=annuity_table)
+
+    commands.add_parser('batch', help='best terms for a file of listings (see batch --help)', add_help=False)
+    commands.add_parser('serve', help='local HTTP/JSON API (see serve --help)', add_help=False)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['batch']:
+        from creative_financing import batch
+        return batch.main(argv[1:])
+    if argv[:1] == ['serve']:
+        from creative_financing import server
+        return server.main(argv[1:])
+    args = build_parser().parse_args(argv)
+    json.dump(to_json(args.run(args)), sys.stdout, indent=2)
+    sys.stdout.write('\n')
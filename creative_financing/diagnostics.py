@@ -0,0 +1,152 @@
+"""Per-run instrumentation for the calculators and pages.
+
+Nothing is recorded unless a run has been started in the current context (thread or
+task), so when diagnostics are off every hook is one ContextVar lookup.
+
+    run = diagnostics.start('best_terms_page')
+    with diagnostics.stage('compute'):
+        ...
+    diagnostics.count('candidates', 1000)
+    diagnostics.finish(run)   # returns the record and appends it to the JSON lines log
+
+A record holds wall time, per-stage timers, counters, this run's cache hits and
+misses, and the peak traced memory. tracemalloc is process wide, so that peak is the
+whole process's: it includes other runs (other sessions) overlapping this one.
+Records are appended as one JSON object per line to CREATIVE_FINANCING_DIAGNOSTICS_LOG
+when that is set.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+from contextlib import nullcontext
+
+
+_current = contextvars.ContextVar('creative_financing_diagnostics', default=None)
+_NULL = nullcontext()
+_log_lock = threading.Lock()
+_tracing = 0
+_owns_tracing = False
+_tracing_lock = threading.Lock()
+
+
+class Run:
+    def __init__(self, name, trace_memory):
+        self.name = name
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.counters = {}
+        self.started = time.perf_counter()
+        self.timestamp = time.time()
+        self.seconds = None
+        self.peak_memory_bytes = None
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def to_dict(self):
+        hits, misses = self.counters.get('cache_hits', 0), self.counters.get('cache_misses', 0)
+        return {
+            'name': self.name,
+            'timestamp': self.timestamp,
+            'seconds': self.seconds,
+            'stages': {k: {'seconds': v[0], 'calls': v[1]} for k, v in self.stages.items()},
+            'counters': self.counters,
+            'cache_hit_rate': hits / (hits + misses) if hits + misses else None,
+            'peak_memory_bytes': self.peak_memory_bytes,
+        }
+
+
+class _Stage:
+    __slots__ = ('run', 'name', 'started')
+
+    def __init__(self, run, name):
+        self.run = run
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        seconds, calls = self.run.stages.get(self.name, (0.0, 0))
+        self.run.stages[self.name] = (seconds + time.perf_counter() - self.started, calls + 1)
+
+
+def enabled():
+    return _current.get() is not None
+
+
+def stage(name):
+    """Context manager timing a stage of the current run; a shared no-op when off."""
+    run = _current.get()
+    return _NULL if run is None else run.stage(name)
+
+
+def count(name, n=1):
+    run = _current.get()
+    if run is not None:
+        run.counters[name] = run.counters.get(name, 0) + n
+
+
+def flag(name, value=True):
+    run = _current.get()
+    if run is not None:
+        run.counters[name] = value
+
+
+def _stop_tracing():
+    global _tracing
+    with _tracing_lock:
+        _tracing -= 1
+        if _tracing == 0 and _owns_tracing:
+            tracemalloc.stop()
+
+
+def start(name, enabled=True, trace_memory=True):
+    """Starts recording in the current context and returns the run, or None when not enabled.
+
+    trace_memory turns on tracemalloc, which is process wide and slows allocation-heavy
+    code while on; it is stopped again once no run needs it, including runs that were
+    never finished because their script raised. The peak is only reset when no other
+    run is tracing, so overlapping runs report the process's peak since the first of
+    them started, too high rather than too low.
+    """
+    global _tracing, _owns_tracing
+    if not enabled:
+        return None
+    run = Run(name, trace_memory)
+    run._token = _current.set(run)
+    if trace_memory:
+        with _tracing_lock:
+            if _tracing == 0:
+                _owns_tracing = not tracemalloc.is_tracing()
+                if _owns_tracing:
+                    tracemalloc.start()
+                # the peak is shared: resetting it under another run would lose that
+                # run's peak, so only the first of overlapping runs resets it
+                tracemalloc.reset_peak()
+            _tracing += 1
+        run._release = weakref.finalize(run, _stop_tracing)
+    return run
+
+
+def finish(run, log_path=None):
+    """Stops recording, logs the run and returns its record; finish(None) is a no-op."""
+    if run is None:
+        return None
+    run.seconds = time.perf_counter() - run.started
+    if run.trace_memory:
+        run.peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+        run._release()
+    _current.reset(run._token)
+
+    record = run.to_dict()
+    log_path = log_path or os.environ.get('CREATIVE_FINANCING_DIAGNOSTICS_LOG')
+    if log_path:
+        line = json.dumps(record, default=float) + '\n'
+        with _log_lock, open(log_path, 'a') as f:
+            f.write(line)
+    return record
@@ -0,0 +1,155 @@
+"""Bulk export of exact amortization schedules to one columnar Parquet or Arrow file.
+
+    python -m creative_financing schedules deals.csv schedules.parquet
+
+Every deal's schedule (creative_financing.schedules, in int64 cents) is written as
+rows of deal_id, month (int16), payment, interest, principal and balance. Deals are
+computed a chunk at a time on one array grid and appended straight from the arrays,
+one Parquet row group (or Arrow record batch) per chunk, so nothing is built per
+schedule and memory stays bounded on any number of deals.
+
+Parquet files carry row group statistics and a page index on deal_id, so a reader
+filtering on one deal skips the rest of the file; with deals written in id order
+that is a single row group. Arrow IPC files (.arrow, .feather) are uncompressed and
+can be memory-mapped. read_schedule does either:
+
+    read_schedule('schedules.parquet', 'deal-42').to_pandas()
+
+Input rows need deal_id and the seller_financing_calculator arguments as columns:
+sale_price, down_payment_rate, annual_interest_rate, loan_term_years, and optionally
+balloon_due_years and interest_only_years (blank or missing means none). pyarrow is
+required.
+"""
+import os
+
+import numpy as np
+
+from creative_financing.schedules import amortization_schedules
+
+
+DEAL_COLUMNS = ['deal_id', 'sale_price', 'down_payment_rate', 'annual_interest_rate', 'loan_term_years', 'balloon_due_years', 'interest_only_years']
+OPTIONAL_COLUMNS = ['balloon_due_years', 'interest_only_years']
+SCHEDULE_COLUMNS = {
+    'payment': "Monthly Payment",
+    'interest': "Interest",
+    'principal': "Principal",
+    'balance': "Remaining Balance",
+}
+
+
+def _is_arrow(path):
+    return os.path.splitext(path)[1].lower() in ('.arrow', '.feather', '.ipc')
+
+
+def schedule_table(deal_ids, schedules, deal_id_type=None):
+    """Long-format pyarrow Table of amortization_schedules' result, one row per deal and month."""
+    import pyarrow as pa
+    months = schedules["Month"]
+    in_schedule = months > 0
+    columns = {
+        'deal_id': pa.array(np.repeat(np.asarray(deal_ids), schedules["Months"]), type=deal_id_type),
+        'month': months[in_schedule].astype(np.int16),
+    }
+    for name, key in SCHEDULE_COLUMNS.items():
+        columns[name] = schedules[key][in_schedule]
+    return pa.table(columns)
+
+
+class ScheduleWriter:
+    """Appends schedules to a Parquet file, one row group per write, or an Arrow IPC file.
+
+    write() takes a chunk of deals as arrays (anything amortization_schedules takes)
+    and returns the number of schedule rows written.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.arrow = _is_arrow(path)
+        self._writer = None
+        self._sink = None
+        self.deals = 0
+        self.rows = 0
+
+    def write(self, deal_ids, sale_price, down_payment_rate, annual_interest_rate, loan_term_years, balloon_due_years=None, interest_only_years=None):
+        if len(deal_ids) == 0:
+            return 0
+        schedules = amortization_schedules(sale_price, down_payment_rate, annual_interest_rate, loan_term_years, balloon_due_years, interest_only_years)
+        table = schedule_table(deal_ids, schedules, None if self._writer is None else self._schema.field('deal_id').type)
+        if self._writer is None:
+            self._open(table.schema)
+        table = table.replace_schema_metadata(self._schema.metadata)
+        if self.arrow:
+            self._writer.write_table(table, max_chunksize=table.num_rows)
+        else:
+            self._writer.write_table(table, row_group_size=table.num_rows)
+        self.deals += len(deal_ids)
+        self.rows += table.num_rows
+        return table.num_rows
+
+    def _open(self, schema):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._schema = schema.with_metadata({'amounts': 'int64 cents', 'source': 'creative_financing.schedules'})
+        if self.arrow:
+            self._sink = pa.OSFile(self.path, 'wb')
+            self._writer = pa.ipc.new_file(self._sink, self._schema)
+        else:
+            self._writer = pq.ParquetWriter(self.path, self._schema, compression='zstd', write_page_index=True)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_deals(path, chunk_size):
+    """Yields dicts of DEAL_COLUMNS arrays from a CSV or Parquet file, chunk_size deals at a time."""
+    import pyarrow.parquet as pq
+    from pyarrow import csv
+    if os.path.splitext(path)[1].lower() in ('.parquet', '.pq'):
+        batches = pq.ParquetFile(path).iter_batches(batch_size=chunk_size)
+    else:
+        # deal ids stay strings even when they look like numbers
+        batches = csv.open_csv(path, convert_options=csv.ConvertOptions(column_types={'deal_id': 'string'}))
+    for batch in batches:
+        for start in range(0, batch.num_rows, chunk_size):
+            chunk = batch.slice(start, chunk_size)
+            names = chunk.schema.names
+            missing = [c for c in DEAL_COLUMNS if c not in names and c not in OPTIONAL_COLUMNS]
+            if missing:
+                raise ValueError('missing %s' % ', '.join(missing))
+            deals = {'deal_id': chunk.column('deal_id').to_numpy(zero_copy_only=False)}
+            for column in DEAL_COLUMNS[1:]:
+                if column in names:
+                    values = chunk.column(column).cast('float64').to_numpy(zero_copy_only=False)
+                    deals[column] = np.nan_to_num(values, nan=0.0) if column in OPTIONAL_COLUMNS else values
+                else:
+                    deals[column] = 0.0
+            yield deals
+
+
+def export_schedules(input_path, output_path, chunk_size=1000):
+    """Writes the schedule of every deal in input_path to output_path; returns (deals, rows)."""
+    with ScheduleWriter(output_path) as writer:
+        for deals in read_deals(input_path, chunk_size):
+            writer.write(deals.pop('deal_id'), **deals)
+    return writer.deals, writer.rows
+
+
+def read_schedule(path, deal_id):
+    """One deal's schedule as a pyarrow Table, without reading the rest of the file."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    if not _is_arrow(path):
+        return pq.read_table(path, filters=[('deal_id', '=', deal_id)])
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+        return table.filter(pc.equal(table['deal_id'], deal_id))
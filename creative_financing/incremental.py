@@ -0,0 +1,122 @@
+"""Incremental exact schedules for a session that changes one input at a time.
+
+The Seller Financing page reruns on every widget change, and most changes leave most
+of the schedule alone. Each exact schedule computed here leaves its state behind in
+the shared CACHE (creative_financing.cache): the full term balances (unrounded cents,
+see creative_financing.schedules) and the (1 + rate)**k growth table behind them,
+keyed by the deal terms they depend on. The next schedule is derived from the state
+of the previous call's inputs:
+
+    balloon             slice: balances do not depend on the balloon, only where
+                        the schedule stops and the payoff row
+    price, down payment loan: the growth table is reused and the balances are
+                        re-evaluated from it in one pass; they are not a scaled
+                        copy, the payment is rounded to the cent so the balance is
+                        not proportional to the loan
+    interest only       suffix: months before the shorter interest-only period are
+                        unchanged, only the rest is re-evaluated
+    rate, term          full: the growth table is rebuilt
+
+State is shared by every session (any inputs with the same terms reuse it) and
+bounded with everything else in CACHE; a session keeps only its inputs. Evicted state
+just means a full path. Each path gives exactly what seller_financing_schedule gives
+for the same inputs. It is called like seller_financing_calculator; exact=False has
+no incremental path and just calls it.
+
+    result = IncrementalSchedule()(400000, 10, 5, 30, 5, 1)
+    schedule = IncrementalSchedule(previous=dict(sale_price=400000, down_payment_rate=10, annual_interest_rate=5, loan_term_years=30, balloon_due_years=5, interest_only_years=1))
+    result = schedule(400000, 10, 5, 30, 7, 1)   # schedule.path == 'slice'
+"""
+import math
+
+import numpy as np
+
+from creative_financing import diagnostics
+from creative_financing.cache import CACHE
+from creative_financing.schedules import balances, deal_terms, schedule_columns, single_deal
+from creative_financing.seller_financing import seller_financing_calculator
+
+
+STATE_OVERHEAD = 1024  # bytes of a state besides its arrays, roughly what sizeof counts
+
+
+def state_key(sale_price, down_payment_rate, annual_interest_rate, loan_term_years, balloon_due_years=None, interest_only_years=None, exact=True):
+    """CACHE key of a deal's schedule state: the terms its balances depend on.
+
+    Scalar arithmetic, the same float operations deal_terms does on arrays (which costs
+    more than the rest of a slice), so looking up the previous state is cheap.
+    """
+    sale_price, down_payment_rate, annual_interest_rate, loan_term_years = (float(x or 0) for x in (sale_price, down_payment_rate, annual_interest_rate, loan_term_years))
+    loan_amount = math.floor(sale_price * 100 + 0.5) - math.trunc(sale_price * (down_payment_rate / 100)) * 100
+    total_payments = int(loan_term_years * 12)
+    interest_only_months = int(min(float(interest_only_years or 0) * 12, total_payments))
+    return ('creative_financing.incremental', annual_interest_rate, total_payments, loan_amount, interest_only_months)
+
+
+class IncrementalSchedule:
+    """Exact seller financing results, derived from the cached state of previous's.
+
+    previous: the inputs of the session's last call as keyword arguments, as in the
+    cache key's arguments, or None.
+    """
+
+    def __init__(self, previous=None, cache=CACHE):
+        self.previous = previous
+        self.cache = cache
+        self.path = None
+
+    def __call__(self, sale_price, down_payment_rate, annual_interest_rate, loan_term_years, balloon_due_years=None, interest_only_years=None, exact=True):
+        if not exact:
+            return seller_financing_calculator(sale_price, down_payment_rate, annual_interest_rate, loan_term_years, balloon_due_years, interest_only_years)
+        terms = deal_terms(sale_price, down_payment_rate, annual_interest_rate, loan_term_years, balloon_due_years, interest_only_years)
+        key = state_key(sale_price, down_payment_rate, annual_interest_rate, loan_term_years, balloon_due_years, interest_only_years)
+        state = self.cache.get(key)
+        if state is not None:
+            self.path = 'slice'
+        else:
+            state = self._derive(terms, self._previous_state())
+            self.cache.put(key, state, size=STATE_OVERHEAD + sum(state[name].nbytes for name in ('month', 'growth', 'balance')))
+        diagnostics.count('incremental_%s' % self.path)
+
+        months = max(int(terms['last_month'][0]), 1)
+        result = single_deal(schedule_columns(terms, state['month'][:months], state['balance'][:, :months]))
+        diagnostics.count('schedule_rows', len(result["Amortization Table"]["Month"]))
+        return result
+
+    def _previous_state(self):
+        return None if self.previous is None else self.cache.get(state_key(**self.previous))
+
+    def _derive(self, terms, previous):
+        # previous is shared and read-only, so every path builds new arrays
+        months = max(int(terms['total_payments'][0]), 1)
+        if previous is None or previous['rate'] != terms['annual_interest_rate'][0] or len(previous['month']) != months:
+            self.path = 'full'
+            # Growth factors for 0 to all of the term's payments, as amortization_schedules computes them
+            month = np.arange(1, months + 1)
+            with np.errstate(over='ignore'):
+                growth = np.power(1 + terms['monthly_interest_rate'], np.arange(months + 1))
+            k = amortizing_payments(month, terms)
+            balance = balances(terms, k, growth[k])
+        else:
+            month, growth = previous['month'], previous['growth']
+            k = amortizing_payments(month, terms)
+            if previous['loan_amount'] != terms['loan_amount'][0]:
+                self.path = 'loan'
+                balance = balances(terms, k, growth[k])
+            else:
+                self.path = 'suffix'
+                start = int(min(previous['interest_only_months'], terms['interest_only_months'][0]))
+                balance = previous['balance'].copy()
+                balance[:, start:] = balances(terms, k[:, start:], growth[k[:, start:]])
+        return {
+            'rate': float(terms['annual_interest_rate'][0]),
+            'loan_amount': int(terms['loan_amount'][0]),
+            'interest_only_months': int(terms['interest_only_months'][0]),
+            'month': month,
+            'growth': growth,
+            'balance': balance,
+        }
+
+
+def amortizing_payments(month, terms):
+    return np.maximum(month - terms['interest_only_months'][:, None], 0)
@@ -0,0 +1,162 @@
+"""Inverse solvers: the offer price, interest rate or down payment that hits a target.
+
+optimize_terms and the Seller Financing page go from terms to numbers. solve_terms
+goes the other way: given a target monthly payment, buyer monthly cash flow, buyer
+cash-on-cash return or balloon amount, it finds the value of one term that produces
+it, holding the others fixed. Loans amortize over 30 years as in optimize_terms.
+
+    solve_terms('offer_price', 'monthly_cash_flow', 400, down_payment_pct=10, interest_rate=5,
+                rental_income=2500, monthly_expenses=600)
+
+Every argument broadcasts, so a whole file of deals, or a range of targets, solves in
+one call. Each metric is linear in the offer price and in the down payment, so those
+have closed forms. The rate only enters through the payment factor and the remaining
+balance fraction, which both rise with it; it is found by bracketed regula falsi
+(Illinois) with a bisection fallback.
+
+Buyer metrics get worse as the price or rate rises, so for them the solution is the
+highest price or rate that still meets the target. For the down payment it is the
+lowest one that meets it: payment and cash flow improve as the down payment rises,
+and so does cash-on-cash while the loan's annual payment rate (12 x the payment
+factor) is above the target. Below it, at low rates, a larger down payment lowers
+cash-on-cash, so the answer is 0% if that meets the target. Where no value in range
+meets the target (a price below 0, a down payment above 100%, a rate outside
+0-max_interest_rate) the result is NaN, as it is where every price meets it (at 100%
+down there is no loan); the balloon amount has to be matched exactly.
+"""
+import numpy as np
+
+from creative_financing.best_terms import calculate_balloon_payments, calculate_monthly_payments
+
+
+SOLVE_FOR = ['offer_price', 'interest_rate', 'down_payment_pct']
+METRICS = ['monthly_payment', 'monthly_cash_flow', 'cash_on_cash_return', 'balloon_amount']
+TERM_YEARS = 30
+
+
+def payment_factor(interest_rate):
+    """Monthly payment per dollar of loan."""
+    return calculate_monthly_payments(1.0, interest_rate, TERM_YEARS)
+
+def balance_factor(interest_rate, balloon_years):
+    """Balance left at the balloon per dollar of loan."""
+    return calculate_balloon_payments(payment_factor(interest_rate), interest_rate, TERM_YEARS, balloon_years)
+
+def fast_payment_factor(interest_rate):
+    # payment_factor with numpy's power instead of Python's per distinct rate; the
+    # last bit does not matter inside the root finder and every iterate is distinct
+    monthly_interest_rate = np.asarray(interest_rate, dtype=float) / 100 / 12
+    with np.errstate(divide='ignore', invalid='ignore'):
+        amortizing = monthly_interest_rate / (1 - np.power(1 + monthly_interest_rate, -TERM_YEARS * 12))
+    return np.where(monthly_interest_rate == 0, 1 / (TERM_YEARS * 12), amortizing)
+
+def fast_balance_factor(interest_rate, balloon_years):
+    return calculate_balloon_payments(fast_payment_factor(interest_rate), interest_rate, TERM_YEARS, balloon_years)
+
+def required_payment(metric, target, offer_price, down_payment_pct, rental_income, monthly_expenses):
+    """Monthly payment that makes a buyer metric equal target."""
+    if metric == 'monthly_payment':
+        return target
+    if metric == 'monthly_cash_flow':
+        return rental_income - monthly_expenses - target
+    # (rent - payment - expenses) * 12 = target * (down payment + a year of expenses)
+    return rental_income - monthly_expenses - target * (offer_price * down_payment_pct / 100 + monthly_expenses * 12) / 12
+
+def solve_increasing(func, target, low, high, tol=1e-10, max_iter=100):
+    """x in [low, high] with func(x) = target for increasing func, elementwise; NaN where out of range.
+
+    Illinois regula falsi: secant steps inside a bracket that always contains the root,
+    halving the stale end's weight when one side keeps moving. Where that stalls a
+    plain bisection step is taken, so convergence is never worse than bisection.
+    """
+    target = np.asarray(target, dtype=float)
+    low, high = np.broadcast_arrays(np.asarray(low, dtype=float), np.asarray(high, dtype=float))
+    shape = np.broadcast_shapes(target.shape, low.shape)
+    low, high, target = (np.array(np.broadcast_to(a, shape)) for a in (low, high, target))
+    f_low = func(low) - target
+    f_high = func(high) - target
+    # A target within rounding of an end of the range solves at that end
+    slack = 1e-12 * np.abs(target)
+    valid = (f_low <= slack) & (f_high >= -slack)
+    x = np.where(f_low >= -slack, low, high)
+    active = valid & (f_low < -slack) & (f_high > slack)
+    side = np.zeros(shape, dtype=int)
+
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        with np.errstate(divide='ignore', invalid='ignore'):
+            secant = (low * f_high - high * f_low) / (f_high - f_low)
+        # Bisect where the secant is undefined or leaves the bracket
+        bisect = ~((secant > low) & (secant < high))
+        x = np.where(active, np.where(bisect, (low + high) / 2, secant), x)
+        fx = func(x) - target
+        below = active & (fx < 0)
+        above = active & (fx > 0)
+        # Illinois: halve the weight of the end that did not move twice in a row
+        f_high = np.where(below & (side == -1), f_high / 2, f_high)
+        f_low = np.where(above & (side == 1), f_low / 2, f_low)
+        low = np.where(below, x, low)
+        f_low = np.where(below, fx, f_low)
+        high = np.where(above, x, high)
+        f_high = np.where(above, fx, f_high)
+        side = np.where(below, -1, np.where(above, 1, side))
+        active &= (np.abs(fx) > 4e-16 * np.abs(target)) & (high - low > tol * np.maximum(1, np.abs(x)))
+    return np.where(valid, x, np.nan)
+
+def solve_terms(solve_for, metric, target, offer_price=None, down_payment_pct=None, interest_rate=None,
+                rental_income=0, monthly_expenses=0, balloon_years=5, max_interest_rate=100):
+    """The value of solve_for that makes metric equal target, the other terms fixed.
+
+    solve_for is one of SOLVE_FOR and metric one of METRICS; the two terms not solved
+    for are required. cash_on_cash_return is a fraction (0.07 for 7%), rates and down
+    payments are percents. All arguments broadcast; the result is a float array.
+    """
+    if solve_for not in SOLVE_FOR:
+        raise ValueError('solve_for must be one of %s' % ', '.join(SOLVE_FOR))
+    if metric not in METRICS:
+        raise ValueError('metric must be one of %s' % ', '.join(METRICS))
+    given = {'offer_price': offer_price, 'down_payment_pct': down_payment_pct, 'interest_rate': interest_rate}
+    missing = [name for name, value in given.items() if name != solve_for and value is None]
+    if missing:
+        raise ValueError('%s required to solve for %s' % (' and '.join(missing), solve_for))
+    target, rental_income, monthly_expenses, balloon_years = (np.asarray(a, dtype=float) for a in (target, rental_income, monthly_expenses, balloon_years))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if solve_for == 'interest_rate':
+            loan = np.asarray(offer_price, dtype=float) * (1 - np.asarray(down_payment_pct, dtype=float) / 100)
+            if metric == 'balloon_amount':
+                fraction = target / loan
+                fraction = np.broadcast_to(fraction, np.broadcast_shapes(fraction.shape, balloon_years.shape))
+                result = solve_increasing(lambda rate: fast_balance_factor(rate, balloon_years), fraction, 0, max_interest_rate)
+            else:
+                payment = required_payment(metric, target, offer_price, down_payment_pct, rental_income, monthly_expenses)
+                result = solve_increasing(fast_payment_factor, payment / loan, 0, max_interest_rate)
+            return result
+
+        factor = balance_factor(interest_rate, balloon_years) if metric == 'balloon_amount' else payment_factor(interest_rate)
+        if solve_for == 'offer_price':
+            down = np.asarray(down_payment_pct, dtype=float) / 100
+            if metric == 'cash_on_cash_return':
+                # price * ((1 - down) * factor + target * down / 12) = rent - expenses - target * expenses
+                result = (rental_income - monthly_expenses - target * monthly_expenses) / ((1 - down) * factor + target * down / 12)
+            else:
+                amount = target if metric == 'balloon_amount' else required_payment(metric, target, None, None, rental_income, monthly_expenses)
+                result = amount / ((1 - down) * factor)
+            # inf at 100% down: no loan, so every price meets a payment target
+            return np.where(np.isfinite(result) & (result >= 0), result, np.nan)
+
+        price = np.asarray(offer_price, dtype=float)
+        if metric == 'cash_on_cash_return':
+            # Met where down * price * (12 * factor - target) >= rhs. Above the target's rate
+            # that bounds the down payment from below, as in best_terms.smallest_down_payments;
+            # at or below it the smallest down payment, 0, is the best there is
+            annual = 12 * factor
+            rhs = annual * price - 12 * (rental_income - monthly_expenses) + 12 * target * monthly_expenses
+            result = np.where(annual > target, np.maximum(rhs / (price * (annual - target)), 0) * 100, np.where(rhs <= 0, 0.0, np.nan))
+            return np.where(result <= 100, result, np.nan)
+        if metric == 'balloon_amount':
+            result = (1 - target / (price * factor)) * 100
+            return np.where((result >= 0) & (result <= 100), result, np.nan)
+        result = np.maximum(1 - required_payment(metric, target, None, None, rental_income, monthly_expenses) / (price * factor), 0) * 100
+        return np.where(result <= 100, result, np.nan)
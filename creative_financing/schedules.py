@@ -0,0 +1,219 @@
+"""Exact amortization schedules in integer cents, for one deal or thousands at once.
+
+seller_financing_calculator works in floats, so its rows do not tie out to the cent.
+Here every amount is an int64 number of cents and the rounding is fixed:
+
+    payment     the level payment rounded half up to the cent (interest only
+                payments: the loan times the monthly rate, rounded the same way)
+    balance     after each payment, the exact balance under the rounded payment,
+                rounded half up to the cent
+    principal   the drop in balance
+    interest    the payment less the principal, so within about a cent of
+                balance x rate
+
+The last row (the balloon month, or the end of the term) pays off whatever balance is
+left: its principal is the whole balance and its payment absorbs the residual of the
+rounded payments. So principal sums to the loan exactly, every row is interest plus
+principal, and the final balance is 0. A payment rounded up can clear the loan before
+then at high rates over long terms; the schedule then ends in the month it does. A
+payment rounded down that cannot keep up raises ValueError once the balance outgrows
+the 2**53 cents a float holds exactly.
+
+Balances come from the closed-form annuity balance rather than a month by month
+recurrence, so a schedule is a handful of array operations over a (deals, months)
+grid, with no Python or Decimal loop however many deals there are.
+"""
+import numpy as np
+
+
+COLUMNS = ["Month", "Monthly Payment", "Interest", "Principal", "Remaining Balance"]
+
+
+def round_cents(dollars):
+    """Dollars to int64 cents, rounded half up."""
+    return np.floor(np.asarray(dollars, dtype=float) * 100 + 0.5).astype(np.int64)
+
+def round_half_up(cents):
+    return np.floor(cents + 0.5).astype(np.int64)
+
+def amortization_schedules(sale_price, down_payment_rate, annual_interest_rate, loan_term_years, balloon_due_years=None, interest_only_years=None):
+    """Exact schedules for broadcastable arrays of deals, in cents.
+
+    Arguments are as for seller_financing_calculator; None or 0 means no balloon / no
+    interest-only period, per deal. Returns a dict with 2-d int64 arrays (deals, months)
+    for each of COLUMNS, zero past each deal's last month, plus per deal 1-d arrays:
+    'Months' (schedule length), 'Down Payment', 'Loan Amount', 'Level Payment',
+    'Monthly Payment Interest Only', 'Monthly Payment Non Interest Only', 'Balloon
+    Amount', 'Total Interest Paid' and 'Total Payment Amount', all in cents.
+    """
+    terms = deal_terms(sale_price, down_payment_rate, annual_interest_rate, loan_term_years, balloon_due_years, interest_only_years)
+
+    # Balance after each month; k counts amortizing payments and stays 0 during interest only
+    month = np.arange(1, max(int(terms['last_month'].max(initial=0)), 1) + 1)
+    k = month - terms['interest_only_months'][:, None]
+    np.maximum(k, 0, out=k)
+    rate = terms['monthly_interest_rate'][:, None]
+    with np.errstate(over='ignore'):
+        growth = np.power(1 + rate, k)
+    return schedule_columns(terms, month, balances(terms, k, growth))
+
+
+def deal_terms(sale_price, down_payment_rate, annual_interest_rate, loan_term_years, balloon_due_years=None, interest_only_years=None):
+    """Per deal 1-d arrays of everything but the balance grid, as a dict."""
+    arrays = [np.asarray(0 if x is None else x, dtype=float) for x in (sale_price, down_payment_rate, annual_interest_rate, loan_term_years, balloon_due_years, interest_only_years)]
+    sale_price, down_payment_rate, annual_interest_rate, loan_term_years, balloon_due_years, interest_only_years = (a.ravel() for a in np.broadcast_arrays(*arrays))
+
+    # The down payment is truncated to whole dollars, as in seller_financing_calculator
+    down_payment = np.trunc(sale_price * (down_payment_rate / 100)).astype(np.int64) * 100
+    loan_amount = round_cents(sale_price) - down_payment
+    monthly_interest_rate = annual_interest_rate / 100 / 12
+    total_payments = (loan_term_years * 12).astype(np.int64)
+    amortizes = monthly_interest_rate > 0
+
+    interest_only_months = np.minimum(interest_only_years * 12, total_payments).astype(np.int64)
+    balloon_month = (balloon_due_years * 12).astype(np.int64)
+    has_balloon = (balloon_month > 0) & (balloon_month <= total_payments)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        level = np.where(amortizes, loan_amount * monthly_interest_rate / (1 - (1 + monthly_interest_rate) ** -total_payments), loan_amount / total_payments)
+        # a zero year term has no payments
+        payment = round_half_up(np.where(total_payments > 0, level, 0))
+    return {
+        'down_payment': down_payment,
+        'loan_amount': loan_amount,
+        'annual_interest_rate': annual_interest_rate,
+        'monthly_interest_rate': monthly_interest_rate,
+        'total_payments': total_payments,
+        'amortizes': amortizes,
+        'interest_only_months': interest_only_months,
+        'has_balloon': has_balloon,
+        'last_month': np.where(has_balloon, balloon_month, total_payments),
+        'payment': payment,
+        'interest_only_payment': round_half_up(loan_amount * monthly_interest_rate),
+    }
+
+
+def balances(terms, k, growth):
+    """Unrounded balances (deals, months) from k amortizing payments and growth (1 + rate)**k.
+
+    L growth - P (growth - 1) / r cancels to garbage at high rates over long terms.
+    Written as P / r + growth (L - P / r) instead, the stable balance under the
+    unrounded payment plus what rounding the payment adds up to, with L r - P computed
+    exactly as (L x annual rate - 1200 P) / 1200, which holds for any rate a float
+    represents exactly (whole, half and eighth percents).
+    """
+    loan_amount = terms['loan_amount'][:, None]
+    payment = terms['payment'][:, None]
+    annual_interest_rate = terms['annual_interest_rate'][:, None]
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        balance = (1200 * payment + growth * (loan_amount * annual_interest_rate - 1200 * payment)) / annual_interest_rate
+    amortizes = terms['amortizes']
+    if not amortizes.all():
+        balance[~amortizes] = (loan_amount - payment * k)[~amortizes]
+    return balance
+
+
+def schedule_columns(terms, month, balance):
+    """amortization_schedules' result from deal_terms and the unrounded balance grid."""
+    loan_amount = terms['loan_amount']
+    interest_only_months = terms['interest_only_months']
+    # A payment rounded up overpays every month; at high rates over long terms that
+    # clears the loan early, and it is paid off in the month the balance reaches 0
+    paid_off = (balance < 0.5) & (month < terms['last_month'][:, None]) & (month > interest_only_months[:, None]) & (loan_amount > 0)[:, None]
+    early = paid_off.any(axis=1)
+    last_month = np.where(early, paid_off.argmax(axis=1) + 1, terms['last_month'])
+    has_balloon = terms['has_balloon'] & ~early
+    after = month > last_month[:, None]
+    balance = np.where(after, 0, balance)
+    # past 2**53 cents a float no longer holds every cent
+    exact = np.abs(balance) < 2 ** 53
+    if not exact.all():
+        deal = int((~exact).any(axis=1).argmax())
+        raise ValueError('deal %d: the balance outgrows exact cents ($90 trillion), the rounded payment does not keep up with %g%% interest over %d months' % (deal, terms['annual_interest_rate'][deal], terms['total_payments'][deal]))
+    balance = round_half_up(balance)
+
+    previous = np.empty_like(balance)
+    previous[:, 0] = loan_amount
+    previous[:, 1:] = balance[:, :-1]
+
+    principal = previous - balance
+    scheduled = np.where(month <= interest_only_months[:, None], terms['interest_only_payment'][:, None], terms['payment'][:, None])
+    interest = scheduled - principal
+    # The last row pays off the balance, then nothing is due past it
+    rows = np.arange(len(last_month))
+    last = last_month - 1
+    principal[rows, last] = previous[rows, last]
+    balance[rows, last] = 0
+    for column in (interest, principal):
+        column[after] = 0
+
+    interest_only_payment = np.where(interest_only_months > 0, terms['interest_only_payment'], terms['payment'])
+    columns = {
+        "Month": np.where(after, 0, month),
+        "Monthly Payment": interest + principal,
+        "Interest": interest,
+        "Principal": principal,
+        "Remaining Balance": balance,
+    }
+    return dict(
+        columns,
+        **{
+            "Months": last_month,
+            "Down Payment": terms['down_payment'],
+            "Loan Amount": loan_amount,
+            "Level Payment": terms['payment'],
+            "Monthly Payment Interest Only": interest_only_payment,
+            # the scheduled payment after any interest-only period, before the final row's payoff
+            "Monthly Payment Non Interest Only": np.where(last_month > interest_only_months, terms['payment'], interest_only_payment),
+            # what the last row pays beyond its scheduled payment
+            "Balloon Amount": np.where(has_balloon, columns["Monthly Payment"][rows, last] - scheduled[rows, last], 0),
+            "Total Interest Paid": columns["Interest"].sum(axis=1),
+            "Total Payment Amount": columns["Monthly Payment"].sum(axis=1),
+        },
+    )
+
+
+def seller_financing_schedule(sale_price, down_payment_rate, annual_interest_rate, loan_term_years, balloon_due_years=None, interest_only_years=None):
+    """One deal's exact schedule, laid out like seller_financing_calculator's result.
+
+    Amounts are int cents. The table keeps its final row, where the balloon (or the
+    residual at the end of the term) is paid and the balance reaches 0.
+    """
+    result = amortization_schedules(sale_price, down_payment_rate, annual_interest_rate, loan_term_years, balloon_due_years, interest_only_years)
+    return single_deal(result)
+
+
+def single_deal(result):
+    """The first deal of amortization_schedules' result, laid out like seller_financing_calculator's."""
+    months = int(result["Months"][0])
+    table = {column: result[column][0, :months] for column in COLUMNS}
+    return {
+        "Down Payment": int(result["Down Payment"][0]),
+        "Balloon Amount": int(result["Balloon Amount"][0]),
+        "Monthly Payment Interest Only": int(result["Monthly Payment Interest Only"][0]),
+        "Monthly Payment Non Interest Only": int(result["Monthly Payment Non Interest Only"][0]),
+        "Monthly Payment": int(result["Level Payment"][0]),
+        "Total Interest Paid": int(result["Total Interest Paid"][0]),
+        "Total Payment Amount": int(result["Total Payment Amount"][0]),
+        "Amortization Table": table,
+    }
+
+
+def yearly_rollup(table):
+    """Per loan year totals of a schedule table (one deal's columns, as above).
+
+    Returns 1-d arrays: "Year", "Payments", "Interest", "Principal" and "Ending Balance",
+    summed with np.add.reduceat over the year boundaries. Works on cents or dollars.
+    """
+    month = np.asarray(table["Month"])
+    if month.size == 0:
+        return {key: np.array([], dtype=np.int64) for key in ("Year", "Payments", "Interest", "Principal", "Ending Balance")}
+    year = (month - 1) // 12 + 1
+    starts = np.flatnonzero(np.r_[True, year[1:] != year[:-1]])
+    ends = np.r_[starts[1:], month.size] - 1
+    return {
+        "Year": year[starts],
+        "Payments": np.add.reduceat(np.asarray(table["Monthly Payment"]), starts),
+        "Interest": np.add.reduceat(np.asarray(table["Interest"]), starts),
+        "Principal": np.add.reduceat(np.asarray(table["Principal"]), starts),
+        "Ending Balance": np.asarray(table["Remaining Balance"])[ends],
+    }
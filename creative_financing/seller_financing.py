@@ -0,0 +1,90 @@
+import numpy as np
+
+from creative_financing import annuity, diagnostics
+from creative_financing.schedules import seller_financing_schedule
+
+
+def seller_financing_calculator(sale_price, down_payment_rate, annual_interest_rate, loan_term_years, balloon_due_years=None, interest_only_years=None, exact=False):
+    """Summary and amortization table of one seller financed deal.
+
+    UNITS: by default every amount is float dollars. exact=True returns int CENTS under
+    the same keys, amounts that tie out row by row (see creative_financing.schedules);
+    divide by 100 before showing them next to dollar figures.
+    """
+    if exact:
+        result = seller_financing_schedule(sale_price, down_payment_rate, annual_interest_rate, loan_term_years, balloon_due_years, interest_only_years)
+        diagnostics.count('schedule_rows', len(result["Amortization Table"]["Month"]))
+        return result
+
+    # Calculate the initial loan amount
+    down_payment = int(sale_price * (down_payment_rate/100))
+    loan_amount = sale_price - down_payment
+    
+    # Monthly interest rate
+    monthly_interest_rate = annual_interest_rate / 100 / 12
+    # Total number of payments
+    total_payments = loan_term_years * 12
+    
+    # Calculate the monthly payment for a fully amortizing loan
+    if monthly_interest_rate > 0:
+        monthly_payment = loan_amount * monthly_interest_rate / (1 - 1 / annuity.power(monthly_interest_rate, total_payments))
+    else:
+        monthly_payment = loan_amount / total_payments
+    
+    # Schedule length: a balloon cuts amortization off at the balloon month
+    interest_only_months = min(interest_only_years * 12, total_payments) if interest_only_years else 0
+    balloon_month = balloon_due_years * 12 if balloon_due_years and balloon_due_years * 12 <= total_payments else None
+    last_month = balloon_month or total_payments
+
+    # Closed-form balance after k amortizing payments (k stays 0 during interest only):
+    # the payments still due, discounted, P (1 - (1 + r) ** -(n - k)) / r. The textbook
+    # L (1 + r) ** k - P ((1 + r) ** k - 1) / r cancels to garbage at high rates over long terms
+    month = np.arange(1, last_month + 1)
+    k = np.clip(np.arange(0, last_month + 1) - interest_only_months, 0, None)
+    if monthly_interest_rate > 0:
+        balance = monthly_payment * -np.expm1((k - total_payments) * np.log1p(monthly_interest_rate)) / monthly_interest_rate
+        balance[k == 0] = loan_amount
+    else:
+        balance = loan_amount - monthly_payment * k.astype(float)
+
+    # Create amortization table
+    interest_only = month <= interest_only_months
+    interest = balance[:-1] * monthly_interest_rate
+    principal = np.where(interest_only, 0.0, monthly_payment - interest)
+    payment = np.where(interest_only, loan_amount * monthly_interest_rate, monthly_payment)
+    remaining_balance = np.where(interest_only, balance[1:], np.maximum(balance[1:], 0))
+
+    # At the balloon the remaining balance comes due in a closing row
+    if balloon_month:
+        balloon_payment = balance[-1]
+        month = np.append(month, month[-1])
+        payment = np.append(payment, monthly_payment)
+        interest = np.append(interest, interest[-1])
+        principal = np.append(principal, principal[-1])
+        remaining_balance = np.append(remaining_balance, 0.0)
+
+    diagnostics.count('schedule_rows', len(month))
+
+    # Total interest paid
+    total_interest_paid = interest.sum()
+    
+    # Total payments
+    total_payments_made = payment.sum() + (balloon_payment if balloon_month else 0)
+    
+    return {
+        "Down Payment": down_payment,
+        "Balloon Amount": remaining_balance[-2],
+        "Monthly Payment Interest Only": round(payment[0], 2),
+        "Monthly Payment Non Interest Only": round(payment[-1], 2),
+        "Monthly Payment": round(monthly_payment, 2),
+        "Total Interest Paid": round(total_interest_paid, 2),
+        "Total Payment Amount": round(total_payments_made, 2),
+        # Columns as arrays, pd.DataFrame(...) gives the table; the closing row is dropped
+        "Amortization Table": {
+            "Month": month[:-1],
+            "Monthly Payment": payment[:-1],
+            "Interest": interest[:-1],
+            "Principal": principal[:-1],
+            "Remaining Balance": remaining_balance[:-1],
+        }
+    }
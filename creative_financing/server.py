@@ -0,0 +1,451 @@
+"""Local HTTP/JSON API for the calculators, standard library asyncio only.
+
+    python -m creative_financing serve --port 8765
+
+    POST /seller-financing   seller_financing_calculator arguments; "exact": true for
+                             int cents (creative_financing.schedules), "table": true
+                             to include the amortization table. Amounts are CENTS
+                             when exact and dollars otherwise, under the same keys;
+                             every result says which in "Units"
+    POST /best-terms         optimize_terms arguments; listing_price, rental_income and
+                             monthly_expenses required, the rest default as in batch
+    GET  /metrics            request counts, latency percentiles, throughput, batches
+    GET  /health
+
+A body can be one JSON object or a list of them; the response matches. Requests that
+arrive within --batch-window-ms of each other are coalesced: seller financing
+summaries for a whole batch are one vectorized call (sweep.seller_financing_summary,
+or schedules.amortization_schedules when exact) on a thread, best terms batches go
+to a process pool as one task so the event loop never runs an optimization.
+
+Backpressure: at most --max-pending items are admitted at once; beyond that the
+server answers 503 with Retry-After instead of queueing without bound. Bodies over
+1 MB get 413. Nothing outside this process and its workers is used.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import signal
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+
+import numpy as np
+
+from creative_financing.batch import parse_listing
+
+
+####################################################
+#                      PARAMS                      #
+####################################################
+MAX_BODY_BYTES = 1 << 20
+IDLE_TIMEOUT = 30  # seconds a keep-alive connection may sit between requests
+LATENCY_SAMPLES = 10000
+SELLER_FINANCING_ARGUMENTS = ['sale_price', 'down_payment_rate', 'annual_interest_rate', 'loan_term_years', 'balloon_due_years', 'interest_only_years']
+SELLER_FINANCING_REQUIRED = SELLER_FINANCING_ARGUMENTS[:4]
+# Exact mode summary, keyed as in seller_financing_calculator(exact=True)
+EXACT_SUMMARY = {
+    "Down Payment": "Down Payment",
+    "Balloon Amount": "Balloon Amount",
+    "Monthly Payment Interest Only": "Monthly Payment Interest Only",
+    "Monthly Payment Non Interest Only": "Monthly Payment Non Interest Only",
+    "Monthly Payment": "Level Payment",
+    "Total Interest Paid": "Total Interest Paid",
+    "Total Payment Amount": "Total Payment Amount",
+}
+# Float mode summary keys, as seller_financing_calculator returns them, and the ones it rounds to the cent
+FLOAT_SUMMARY = ["Down Payment", "Balloon Amount", "Monthly Payment Interest Only", "Monthly Payment Non Interest Only", "Monthly Payment", "Total Interest Paid", "Total Payment Amount"]
+FLOAT_ROUNDED = FLOAT_SUMMARY[2:]
+MAX_LOAN_TERM_YEARS = 50
+BEST_TERMS_OPTIONS = {'method': str, 'rate_step': float, 'down_payment_step': float, 'time_budget': float}
+BEST_TERMS_METHODS = ['grid', 'pruned', 'fine', 'anytime']
+# The Best Terms page's largest searches: 0 to 100% by 0.001, a $10M listing by $1
+MAX_GRID_POINTS = 100001
+MAX_OFFER_PRICES = 2000001
+MAX_BALLOON_YEARS = 30
+
+
+class RequestError(ValueError):
+    """A request the client has to fix, answered with 400."""
+
+
+####################################################
+#                   FUNCTION                       #
+####################################################
+def parse_seller_financing(item):
+    if not isinstance(item, dict):
+        raise RequestError('expected a JSON object')
+    missing = [name for name in SELLER_FINANCING_REQUIRED if item.get(name) is None]
+    if missing:
+        raise RequestError('missing %s' % ', '.join(missing))
+    try:
+        arguments = {name: float(item.get(name) or 0) for name in SELLER_FINANCING_ARGUMENTS}
+    except (TypeError, ValueError, OverflowError) as e:
+        raise RequestError(str(e))
+    check_finite(arguments)
+    negative = [name for name in SELLER_FINANCING_ARGUMENTS if arguments[name] < 0]
+    if negative:
+        raise RequestError('%s must not be negative' % ', '.join(negative))
+    if arguments['down_payment_rate'] > 100:
+        raise RequestError('down_payment_rate must be at most 100')
+    if not 0 < arguments['loan_term_years'] <= MAX_LOAN_TERM_YEARS or arguments['loan_term_years'] * 12 != int(arguments['loan_term_years'] * 12):
+        raise RequestError('loan_term_years must be a whole number of months, more than 0 and at most %d years' % MAX_LOAN_TERM_YEARS)
+    arguments['exact'] = bool(item.get('exact', False))
+    arguments['table'] = bool(item.get('table', False))
+    return arguments
+
+
+def parse_best_terms(item):
+    if not isinstance(item, dict):
+        raise RequestError('expected a JSON object')
+    try:
+        arguments = parse_listing(item)
+        for name, kind in BEST_TERMS_OPTIONS.items():
+            if item.get(name) is not None:
+                arguments[name] = kind(item[name])
+    except (TypeError, ValueError, OverflowError) as e:
+        raise RequestError(str(e))
+    arguments.setdefault('method', 'pruned')
+    if arguments['method'] not in BEST_TERMS_METHODS:
+        raise RequestError('method must be one of %s' % ', '.join(BEST_TERMS_METHODS))
+    check_finite({name: value for name, value in arguments.items() if name != 'method'})
+
+    # Ranges optimize_terms can search, no bigger than the page's
+    if arguments['listing_price'] <= 0 or arguments['price_step'] <= 0:
+        raise RequestError('listing_price and price_step must be positive')
+    if int(arguments['listing_price'] * 0.2) // arguments['price_step'] + 1 > MAX_OFFER_PRICES:
+        raise RequestError('at most %d offer prices, use a larger price_step' % MAX_OFFER_PRICES)
+    for low, high in (('min_down_payment_pct', 'max_down_payment_pct'), ('min_interest_rate', 'max_interest_rate')):
+        if not 0 <= arguments[low] <= arguments[high] <= 100:
+            raise RequestError('%s and %s must satisfy 0 <= %s <= %s <= 100' % (low, high, low, high))
+    if not 0 <= arguments['balloon_years'] <= MAX_BALLOON_YEARS:
+        raise RequestError('balloon_years must be from 0 to %d' % MAX_BALLOON_YEARS)
+    for name in ('rate_step', 'down_payment_step', 'time_budget'):
+        if name in arguments and arguments[name] <= 0:
+            raise RequestError('%s must be positive' % name)
+    if arguments['method'] in ('fine', 'anytime'):
+        for low, high, step in (('min_down_payment_pct', 'max_down_payment_pct', 'down_payment_step'), ('min_interest_rate', 'max_interest_rate', 'rate_step')):
+            if (arguments[high] - arguments[low]) / arguments.get(step, 0.01 if step == 'down_payment_step' else 0.125) + 1 > MAX_GRID_POINTS:
+                raise RequestError('at most %d points from %s to %s, use a larger %s' % (MAX_GRID_POINTS, low, high, step))
+    return arguments
+
+
+def check_finite(arguments):
+    # inf and nan parse as floats, then overflow or loop forever downstream
+    bad = [name for name, value in arguments.items() if not isinstance(value, bool) and not math.isfinite(value)]
+    if bad:
+        raise RequestError('%s must be finite' % ', '.join(bad))
+
+
+def seller_financing_batch(items):
+    """Results for a batch of parsed seller financing requests, vectorized per mode."""
+    from creative_financing.schedules import COLUMNS, amortization_schedules
+    from creative_financing.seller_financing import seller_financing_calculator
+    from creative_financing.sweep import seller_financing_summary
+    results = [None] * len(items)
+    for exact in (False, True):
+        indices = [i for i, item in enumerate(items) if item['exact'] == exact]
+        if not indices:
+            continue
+        columns = [np.array([items[i][name] for i in indices]) for name in SELLER_FINANCING_ARGUMENTS]
+        if exact:
+            try:
+                schedules = amortization_schedules(*columns)
+            except ValueError as e:
+                # a deal whose balance outgrows exact cents fails alone
+                for i in indices:
+                    results[i] = seller_financing_batch([items[i]])[0] if len(indices) > 1 else RequestError(str(e).split(': ', 1)[-1])
+                continue
+            for n, i in enumerate(indices):
+                result = {key: int(schedules[source][n]) for key, source in EXACT_SUMMARY.items()}
+                result["Units"] = "cents"
+                if items[i]['table']:
+                    months = int(schedules["Months"][n])
+                    result["Amortization Table"] = {column: schedules[column][n, :months].tolist() for column in COLUMNS}
+                results[i] = result
+        else:
+            summary = seller_financing_summary(*columns)
+            for n, i in enumerate(indices):
+                # rounded and keyed as seller_financing_calculator's result
+                result = {key: round(float(summary[key][n]), 2) if key in FLOAT_ROUNDED else float(summary[key][n]) for key in FLOAT_SUMMARY}
+                result["Down Payment"] = int(result["Down Payment"])
+                result["Units"] = "dollars"
+                if items[i]['table']:
+                    # whole numbers as ints, the calculator counts months with them
+                    arguments = {name: int(items[i][name]) if items[i][name].is_integer() else items[i][name] for name in SELLER_FINANCING_ARGUMENTS}
+                    arguments['balloon_due_years'] = arguments['balloon_due_years'] or None
+                    result["Amortization Table"] = seller_financing_calculator(**arguments)["Amortization Table"]
+                results[i] = result
+    return results
+
+
+def best_terms_batch(items):
+    """optimize_terms for a batch of parsed requests; runs in a worker process."""
+    from creative_financing.best_terms import optimize_terms
+    results = []
+    for arguments in items:
+        try:
+            results.append(optimize_terms(**arguments))
+        except (ValueError, TypeError, ZeroDivisionError) as e:
+            results.append(RequestError('%s: %s' % (type(e).__name__, e)))
+        except Exception as e:
+            # anything else fails this item only, answered with 500
+            results.append(RuntimeError('%s: %s' % (type(e).__name__, e)))
+    return results
+
+
+def percentile(samples, q):
+    return float(np.percentile(samples, q)) if samples else None
+
+
+class Metrics:
+    """Per endpoint request counts, latency samples and batch sizes."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.endpoints = {}
+
+    def endpoint(self, name):
+        if name not in self.endpoints:
+            self.endpoints[name] = {
+                'requests': 0, 'items': 0, 'errors': 0, 'rejected': 0, 'in_flight': 0,
+                'latency': deque(maxlen=LATENCY_SAMPLES), 'completed': deque(maxlen=LATENCY_SAMPLES),
+                'batches': 0, 'batch_items': 0, 'max_batch': 0,
+            }
+        return self.endpoints[name]
+
+    def batch(self, name, size):
+        stats = self.endpoint(name)
+        stats['batches'] += 1
+        stats['batch_items'] += size
+        stats['max_batch'] = max(stats['max_batch'], size)
+
+    def report(self):
+        now = time.monotonic()
+        endpoints = {}
+        for name, stats in self.endpoints.items():
+            latency = [seconds * 1000 for seconds in stats['latency']]
+            recent = sum(1 for t in stats['completed'] if now - t <= 60)
+            endpoints[name] = {
+                'requests': stats['requests'],
+                'items': stats['items'],
+                'errors': stats['errors'],
+                'rejected': stats['rejected'],
+                'in_flight': stats['in_flight'],
+                'latency_ms': {'p50': percentile(latency, 50), 'p95': percentile(latency, 95), 'p99': percentile(latency, 99), 'max': max(latency, default=None)},
+                'requests_per_second_1m': recent / min(60, max(now - self.started, 1e-9)),
+                'batches': stats['batches'],
+                'mean_batch': stats['batch_items'] / stats['batches'] if stats['batches'] else None,
+                'max_batch': stats['max_batch'],
+            }
+        return {'uptime_seconds': now - self.started, 'endpoints': endpoints}
+
+
+class MicroBatcher:
+    """Collects items submitted within window seconds and runs them as one batch.
+
+    run(items) is a coroutine returning one result per item; a result that is an
+    exception is raised to that item's caller only.
+    """
+
+    def __init__(self, name, run, window, max_batch, metrics):
+        self.name = name
+        self.run = run
+        self.window = window
+        self.max_batch = max_batch
+        self.metrics = metrics
+        self._items = []
+        self._timer = None
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        self._items.append((item, future))
+        if len(self._items) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._items = self._items, []
+        if batch:
+            self.metrics.batch(self.name, len(batch))
+            asyncio.get_running_loop().create_task(self._run(batch))
+
+    async def _run(self, batch):
+        try:
+            results = await self.run([item for item, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+class Server:
+    """The API server; start() binds it, serve_forever() runs until cancelled."""
+
+    def __init__(self, workers=None, batch_window=0.005, max_batch=256, max_pending=1024):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.pending = 0
+        self.metrics = Metrics()
+        self.process_pool = None
+        self.thread_pool = None
+        self.routes = {
+            ('POST', '/seller-financing'): ('seller_financing', parse_seller_financing, MicroBatcher('seller_financing', self._seller_financing, batch_window, max_batch, self.metrics)),
+            # best terms batches are smaller, each item is a whole search
+            ('POST', '/best-terms'): ('best_terms', parse_best_terms, MicroBatcher('best_terms', self._best_terms, batch_window, max(1, max_batch // 16), self.metrics)),
+        }
+        self._server = None
+
+    async def _seller_financing(self, items):
+        return await asyncio.get_running_loop().run_in_executor(self.thread_pool, seller_financing_batch, items)
+
+    async def _best_terms(self, items):
+        return await asyncio.get_running_loop().run_in_executor(self.process_pool, best_terms_batch, items)
+
+    async def start(self, host='127.0.0.1', port=8765):
+        self.process_pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.thread_pool = ThreadPoolExecutor(max_workers=1)
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+        if self.process_pool is not None:
+            self.process_pool.shutdown(cancel_futures=True)
+        if self.thread_pool is not None:
+            self.thread_pool.shutdown(cancel_futures=True)
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {'error': 'body over %d bytes' % MAX_BODY_BYTES}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                status, payload, extra = await self._dispatch(method, target.split('?')[0], body)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                await self._respond(writer, status, payload, keep_alive, extra)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive, extra=None):
+        body = json.dumps(payload, default=lambda value: value.tolist()).encode()
+        head = ['HTTP/1.1 %d %s' % (status, status.phrase), 'Content-Type: application/json', 'Content-Length: %d' % len(body),
+                'Connection: %s' % ('keep-alive' if keep_alive else 'close')]
+        head += ['%s: %s' % item for item in (extra or {}).items()]
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+    async def _dispatch(self, method, path, body):
+        if path == '/health' and method == 'GET':
+            return HTTPStatus.OK, {'status': 'ok'}, None
+        if path == '/metrics' and method == 'GET':
+            return HTTPStatus.OK, dict(self.metrics.report(), pending=self.pending, max_pending=self.max_pending), None
+        if (method, path) not in self.routes:
+            if any(route_path == path for _, route_path in self.routes):
+                return HTTPStatus.METHOD_NOT_ALLOWED, {'error': 'use POST'}, {'Allow': 'POST'}
+            return HTTPStatus.NOT_FOUND, {'error': 'no such endpoint'}, None
+        name, parse, batcher = self.routes[(method, path)]
+        stats = self.metrics.endpoint(name)
+        stats['requests'] += 1
+        started = time.monotonic()
+        try:
+            payload = json.loads(body or b'null')
+            items = [parse(item) for item in (payload if isinstance(payload, list) else [payload])]
+        except (ValueError, OverflowError) as e:
+            stats['errors'] += 1
+            return HTTPStatus.BAD_REQUEST, {'error': str(e)}, None
+
+        if self.pending + len(items) > self.max_pending:
+            stats['rejected'] += 1
+            return HTTPStatus.SERVICE_UNAVAILABLE, {'error': 'server busy, %d items pending' % self.pending}, {'Retry-After': '1'}
+        self.pending += len(items)
+        stats['in_flight'] += len(items)
+        try:
+            results = await asyncio.gather(*(batcher.submit(item) for item in items), return_exceptions=True)
+        finally:
+            self.pending -= len(items)
+            stats['in_flight'] -= len(items)
+        stats['items'] += len(items)
+        stats['latency'].append(time.monotonic() - started)
+        stats['completed'].append(time.monotonic())
+
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            stats['errors'] += 1
+            status = HTTPStatus.BAD_REQUEST if all(isinstance(e, RequestError) for e in errors) else HTTPStatus.INTERNAL_SERVER_ERROR
+            results = [{'error': str(result)} if isinstance(result, Exception) else result for result in results]
+            return status, results if isinstance(payload, list) else results[0], None
+        return HTTPStatus.OK, results if isinstance(payload, list) else results[0], None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m creative_financing serve', description='Local HTTP/JSON API for the calculators.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=None, help='best terms worker processes (default: number of cores)')
+    parser.add_argument('--batch-window-ms', type=float, default=5, help='how long to wait for more requests to batch with')
+    parser.add_argument('--max-batch', type=int, default=256, help='items per seller financing batch; best terms batches are 1/16 of it')
+    parser.add_argument('--max-pending', type=int, default=1024, help='items admitted at once before answering 503')
+    args = parser.parse_args(argv)
+
+    async def run():
+        server = Server(args.workers, args.batch_window_ms / 1000, args.max_batch, args.max_pending)
+        host, port = await server.start(args.host, args.port)
+        # SIGTERM shuts down like Ctrl-C, so the worker processes exit too
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        sys.stderr.write('serving on http://%s:%d\n' % (host, port))
+        try:
+            await server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Stacked financing: several loans on one deal, on a shared month axis.
+
+A wrap-around or subject-to deal layers seller financing over an existing mortgage.
+Each loan (tranche) has its own amount, rate, term, interest-only period and balloon,
+and a role saying who pays whom:
+
+    underlying  the existing mortgage under a wrap; the seller keeps paying it
+    assumed     the existing mortgage taken subject-to; the buyer pays the lender
+    seller      a note the buyer pays the seller: the wrap note or a seller carry
+    lender      a note the buyer pays someone else, e.g. a second lien
+
+For an existing mortgage give its current balance and remaining term; re-amortizing
+that balance gives the loan's own payment, to the cent. Every tranche of every deal
+is one row of a single amortization_schedules call (int64 cents, see
+creative_financing.schedules), so a batch of deals costs one pass over a
+(deals x tranches, months) grid. Month 1 is the first payment after closing for all
+tranches; each runs to its own balloon or term and is 0 after it, except that an
+underlying mortgage outlasting the seller's notes is paid off in their last month:
+the wrap's balloon pays off the loan under it.
+
+    stacked_schedules(amount=[250000, 380000], annual_interest_rate=[3.5, 6.5],
+                      loan_term_years=[25, 30], role=['underlying', 'seller'],
+                      balloon_due_years=[0, 7])
+
+Arguments broadcast to (deals, tranches); 1-d means a single deal. Deals with fewer
+tranches can be padded with amount 0.
+"""
+import numpy as np
+
+from creative_financing.schedules import amortization_schedules
+
+
+ROLES = ['underlying', 'assumed', 'seller', 'lender']
+TRANCHE_COLUMNS = {
+    "Tranche Payment": "Monthly Payment",
+    "Tranche Interest": "Interest",
+    "Tranche Principal": "Principal",
+    "Tranche Balance": "Remaining Balance",
+}
+
+
+def stacked_schedules(amount, annual_interest_rate, loan_term_years, role, balloon_due_years=None, interest_only_years=None):
+    """Schedules of every tranche and the deal totals, all in cents.
+
+    Returns "Month" (the shared axis), per tranche arrays (deals, tranches, months)
+    for each of TRANCHE_COLUMNS, and per deal arrays (deals, months):
+
+        Buyer Payment      what the buyer pays in total (every role but underlying)
+        Seller Receives    payments on the seller's notes
+        Seller Pays        payments on the underlying mortgage
+        Seller Spread      Seller Receives - Seller Pays
+        Buyer Balance      what the buyer still owes
+        Seller Net Balance the seller's notes less the underlying balance
+
+    plus "Months" (the deal's last month, not counting amount 0 padding) and "Total
+    Seller Spread" and "Total Buyer Payments" per deal. Seller Pays includes the payoff
+    of the underlying mortgage in the seller's notes' last month.
+    """
+    numbers = [np.asarray(0 if x is None else x, dtype=float) for x in (amount, annual_interest_rate, loan_term_years, balloon_due_years, interest_only_years)]
+    arrays = np.broadcast_arrays(*numbers, np.asarray(role))
+    if arrays[0].ndim == 1:
+        arrays = [a[None, :] for a in arrays]
+    if arrays[0].ndim != 2:
+        raise ValueError('tranche arguments must be 1-d (one deal) or 2-d (deals, tranches)')
+    amount, annual_interest_rate, loan_term_years, balloon_due_years, interest_only_years, role = arrays
+    unknown = sorted(set(role.ravel().tolist()) - set(ROLES))
+    if unknown:
+        raise ValueError('unknown role %s, expected one of %s' % (', '.join(map(str, unknown)), ', '.join(ROLES)))
+
+    # One row per tranche, amounts are the loans themselves so no down payment
+    schedules = amortization_schedules(amount.ravel(), 0, annual_interest_rate.ravel(), loan_term_years.ravel(), balloon_due_years.ravel(), interest_only_years.ravel())
+    deals, tranches = amount.shape
+    months = schedules["Month"].shape[1]
+    result = {"Month": np.arange(1, months + 1)}
+    for key, column in TRANCHE_COLUMNS.items():
+        result[key] = schedules[column].reshape(deals, tranches, months)
+
+    # The wrap's last month (its balloon, or its term) pays off every underlying
+    # mortgage still running: its remaining balance joins that month's payment
+    tranche_months = schedules["Months"].reshape(deals, tranches)
+    real = amount > 0
+    seller_end = np.where((role == 'seller') & real, tranche_months, 0).max(axis=1)
+    payoff = (role == 'underlying') & (seller_end[:, None] > 0) & (tranche_months > seller_end[:, None])
+    if payoff.any():
+        deal, tranche = np.nonzero(payoff)
+        last = seller_end[deal] - 1
+        remaining = result["Tranche Balance"][deal, tranche, last]
+        result["Tranche Payment"][deal, tranche, last] += remaining
+        result["Tranche Principal"][deal, tranche, last] += remaining
+        result["Tranche Balance"][deal, tranche, last] = 0
+        after = result["Month"] > seller_end[deal][:, None]
+        for key in TRANCHE_COLUMNS:
+            result[key][deal, tranche] = np.where(after, 0, result[key][deal, tranche])
+        tranche_months = np.where(payoff, seller_end[:, None], tranche_months)
+
+    payment = result["Tranche Payment"]
+    balance = result["Tranche Balance"]
+    buyer = (role != 'underlying')[..., None]
+    seller = (role == 'seller')[..., None]
+    underlying = (role == 'underlying')[..., None]
+    result["Buyer Payment"] = np.where(buyer, payment, 0).sum(axis=1)
+    result["Seller Receives"] = np.where(seller, payment, 0).sum(axis=1)
+    result["Seller Pays"] = np.where(underlying, payment, 0).sum(axis=1)
+    result["Seller Spread"] = result["Seller Receives"] - result["Seller Pays"]
+    result["Buyer Balance"] = np.where(buyer, balance, 0).sum(axis=1)
+    result["Seller Net Balance"] = np.where(seller, balance, 0).sum(axis=1) - np.where(underlying, balance, 0).sum(axis=1)
+    # padding tranches (amount 0) do not lengthen the deal
+    result["Months"] = np.where(real, tranche_months, 0).max(axis=1)
+    result["Total Seller Spread"] = result["Seller Spread"].sum(axis=1)
+    result["Total Buyer Payments"] = result["Buyer Payment"].sum(axis=1)
+    return result
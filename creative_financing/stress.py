@@ -0,0 +1,147 @@
+"""Monte Carlo stress test of a set of offer terms.
+
+optimize_terms picks terms for one exact rent and expense figure. stress_test holds
+those terms fixed and draws rent, expenses and the buyer's refinance rate at the
+balloon from distributions, reporting how buyer cash-on-cash is spread and how
+often it misses the 7% target.
+
+Scenarios are drawn in fixed-size chunks, each from its own child of one
+SeedSequence, so a seed gives the same answer for any number of workers. Only
+histograms and running sums are kept per chunk, so memory is bounded by the chunk
+size however many scenarios run.
+
+Distributions are dicts, e.g. {'kind': 'normal', 'mean': 2000, 'std': 200}:
+
+    fixed       value
+    normal      mean, std            (clipped at 0)
+    lognormal   mean, std            (of the values themselves, not their log)
+    uniform     low, high
+    triangular  low, mode, high
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from creative_financing.best_terms import TARGET_CASH_ON_CASH_RETURN, calculate_balloon_payment, calculate_monthly_payment
+
+
+# Cash-on-cash histogram: -100% to +100% in 0.1% bins, anything beyond lands in the end bins
+HISTOGRAM_EDGES = np.linspace(-1, 1, 2001)
+PERCENTILES = [5, 25, 50, 75, 95]
+
+
+def default_distributions(rental_income, monthly_expenses, interest_rate):
+    """10% rent and 15% expense volatility, refinance 2 points above the seller's rate."""
+    return {
+        'rent': {'kind': 'normal', 'mean': rental_income, 'std': 0.10 * rental_income},
+        'expenses': {'kind': 'lognormal', 'mean': monthly_expenses, 'std': 0.15 * monthly_expenses},
+        'refinance_rate': {'kind': 'normal', 'mean': interest_rate + 2, 'std': 1.5},
+    }
+
+
+def sample(distribution, rng, size):
+    kind = distribution['kind']
+    if kind == 'fixed':
+        return np.full(size, float(distribution['value']))
+    if kind == 'normal':
+        return np.maximum(rng.normal(distribution['mean'], distribution['std'], size), 0)
+    if kind == 'lognormal':
+        mean, std = distribution['mean'], distribution['std']
+        if mean <= 0:
+            return np.zeros(size)
+        sigma2 = np.log1p((std / mean) ** 2)
+        return rng.lognormal(np.log(mean) - sigma2 / 2, np.sqrt(sigma2), size)
+    if kind == 'uniform':
+        return rng.uniform(distribution['low'], distribution['high'], size)
+    if kind == 'triangular':
+        return rng.triangular(distribution['low'], distribution['mode'], distribution['high'], size)
+    raise ValueError('unknown distribution kind %r' % kind)
+
+
+def _refinance_payment(balance, annual_interest_rate, term_years):
+    monthly_interest_rate = annual_interest_rate / 100 / 12
+    number_of_payments = term_years * 12
+    with np.errstate(divide='ignore', invalid='ignore'):
+        amortizing = balance * monthly_interest_rate / (1 - (1 + monthly_interest_rate) ** -number_of_payments)
+    return np.where(monthly_interest_rate > 0, amortizing, balance / number_of_payments)
+
+
+def _run_chunk(seed_sequence, size, deal, distributions):
+    """Histogram counts and sums for one chunk of scenarios."""
+    rng = np.random.default_rng(seed_sequence)
+    rent = sample(distributions['rent'], rng, size)
+    expenses = sample(distributions['expenses'], rng, size)
+    refinance_rate = sample(distributions['refinance_rate'], rng, size)
+
+    initial_cash_investment = deal['down_payment'] + expenses * 12
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cash_on_cash_return = (rent - deal['monthly_payment'] - expenses) * 12 / initial_cash_investment
+        # after the balloon the buyer carries the balance on a new 30 year loan
+        refinance_payment = _refinance_payment(deal['balloon_balance'], refinance_rate, 30)
+        cash_on_cash_after_refinance = (rent - refinance_payment - expenses) * 12 / initial_cash_investment
+
+    out = {}
+    for name, values in (('cash_on_cash_return', cash_on_cash_return), ('cash_on_cash_after_refinance', cash_on_cash_after_refinance)):
+        values = values[np.isfinite(values)]
+        out[name] = {
+            'counts': np.histogram(np.clip(values, HISTOGRAM_EDGES[0], HISTOGRAM_EDGES[-1]), HISTOGRAM_EDGES)[0],
+            'below_target': int((values < TARGET_CASH_ON_CASH_RETURN).sum()),
+            'n': values.size,
+            'sum': float(values.sum()),
+            'sum_squares': float((values ** 2).sum()),
+        }
+    return out
+
+
+def _summarize(counts, below_target, n, total, sum_squares):
+    mean = total / n if n else float('nan')
+    cumulative = np.cumsum(counts)
+    centers = (HISTOGRAM_EDGES[:-1] + HISTOGRAM_EDGES[1:]) / 2
+    percentiles = {'p%d' % p: float(centers[min(np.searchsorted(cumulative, p / 100 * n), len(centers) - 1)]) if n else float('nan') for p in PERCENTILES}
+    return {
+        'mean': mean,
+        'std': float(np.sqrt(max(sum_squares / n - mean ** 2, 0))) if n else float('nan'),
+        **percentiles,
+        'probability_below_target': below_target / n if n else float('nan'),
+        'histogram': {'edges': HISTOGRAM_EDGES, 'counts': counts},
+    }
+
+
+def stress_test(terms, rental_income, monthly_expenses, scenarios=100000, seed=0, distributions=None, workers=1, chunk_size=250000):
+    """Distribution of buyer cash-on-cash for fixed terms under uncertain rent, expenses and refinance rate.
+
+    terms is an optimize_terms result (offer_price, down_payment_pct, interest_rate and
+    balloon_years are used). distributions overrides any of 'rent', 'expenses' and
+    'refinance_rate' from default_distributions. workers > 1 spreads chunks over a
+    process pool; None uses every core.
+    """
+    distributions = dict(default_distributions(rental_income, monthly_expenses, terms['interest_rate']), **(distributions or {}))
+    down_payment = terms['offer_price'] * (terms['down_payment_pct'] / 100)
+    loan_amount = terms['offer_price'] - down_payment
+    deal = {
+        'down_payment': down_payment,
+        'monthly_payment': calculate_monthly_payment(loan_amount, terms['interest_rate'], 30),
+        'balloon_balance': float(calculate_balloon_payment(loan_amount, terms['interest_rate'], 30, terms['balloon_years'])),
+    }
+
+    sizes = [chunk_size] * (scenarios // chunk_size) + ([scenarios % chunk_size] if scenarios % chunk_size else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(sizes))) as pool:
+            chunks = list(pool.map(_run_chunk, seeds, sizes, [deal] * len(sizes), [distributions] * len(sizes)))
+    else:
+        chunks = [_run_chunk(s, size, deal, distributions) for s, size in zip(seeds, sizes)]
+
+    result = {'scenarios': scenarios, 'seed': seed, 'distributions': distributions, 'target_cash_on_cash_return': TARGET_CASH_ON_CASH_RETURN}
+    for name in ('cash_on_cash_return', 'cash_on_cash_after_refinance'):
+        parts = [chunk[name] for chunk in chunks]
+        result[name] = _summarize(
+            sum((p['counts'] for p in parts), np.zeros(len(HISTOGRAM_EDGES) - 1, dtype=np.int64)),
+            sum(p['below_target'] for p in parts),
+            sum(p['n'] for p in parts),
+            sum(p['sum'] for p in parts),
+            sum(p['sum_squares'] for p in parts),
+        )
+    return result
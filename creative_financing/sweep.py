@@ -0,0 +1,100 @@
+"""Summary metrics of seller_financing_calculator over whole parameter grids.
+
+seller_financing_calculator builds the month by month schedule to get its summary.
+Here every summary value comes from closed-form annuity sums, so a grid of 10^5+
+scenarios is a handful of array operations and no schedule is ever built.
+"""
+import numpy as np
+
+
+SUMMARY_KEYS = [
+    "Down Payment",
+    "Balloon Amount",
+    "Monthly Payment Interest Only",
+    "Monthly Payment Non Interest Only",
+    "Monthly Payment",
+    "Total Interest Paid",
+    "Total Payment Amount",
+    "Seller Grand Total",
+]
+
+
+def seller_financing_summary(sale_price, down_payment_rate, annual_interest_rate, loan_term_years, balloon_due_years=None, interest_only_years=None):
+    """seller_financing_calculator's summary for broadcastable arrays of inputs.
+
+    Returns a dict of arrays with the calculator's summary keys plus "Seller Grand Total"
+    (total payments plus down payment, as on the Seller Financing page). Values are not
+    rounded. None or 0 means no balloon / no interest-only period, per element.
+    """
+    arrays = [np.asarray(0 if x is None else x, dtype=float) for x in (sale_price, down_payment_rate, annual_interest_rate, loan_term_years, balloon_due_years, interest_only_years)]
+    sale_price, down_payment_rate, annual_interest_rate, loan_term_years, balloon_due_years, interest_only_years = np.broadcast_arrays(*arrays)
+
+    down_payment = np.trunc(sale_price * (down_payment_rate / 100))
+    loan_amount = sale_price - down_payment
+    monthly_interest_rate = annual_interest_rate / 100 / 12
+    total_payments = loan_term_years * 12
+    amortizes = monthly_interest_rate > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        monthly_payment = np.where(amortizes, loan_amount * monthly_interest_rate / (1 - (1 + monthly_interest_rate) ** -total_payments), loan_amount / total_payments)
+
+        def balance(k):
+            # Remaining balance after k amortizing payments, as the payments still due
+            # discounted (stable at high rates over long terms, see seller_financing_calculator)
+            remaining = monthly_payment * -np.expm1((k - total_payments) * np.log1p(monthly_interest_rate)) / monthly_interest_rate
+            return np.where(k == 0, loan_amount, np.where(amortizes, remaining, loan_amount - monthly_payment * k))
+
+        # Schedule shape, as in seller_financing_calculator
+        interest_only_months = np.minimum(interest_only_years * 12, total_payments)
+        balloon_month = balloon_due_years * 12
+        has_balloon = (balloon_month > 0) & (balloon_month <= total_payments)
+        last_month = np.where(has_balloon, balloon_month, total_payments)
+        interest_only_rows = np.minimum(interest_only_months, last_month)
+        amortizing_rows = last_month - interest_only_rows
+        interest_only_payment = loan_amount * monthly_interest_rate
+
+        # Interest over the amortizing rows is what was paid minus the principal repaid
+        end_balance = balance(amortizing_rows)
+        payments_sum = interest_only_rows * interest_only_payment + amortizing_rows * monthly_payment
+        interest_sum = interest_only_rows * interest_only_payment + amortizing_rows * monthly_payment - (loan_amount - end_balance)
+
+        # The balloon closing row repeats the last payment and interest, then the balance comes due
+        last_interest = np.where(amortizing_rows > 0, balance(np.maximum(amortizing_rows - 1, 0)) * monthly_interest_rate, interest_only_payment)
+        total_interest_paid = interest_sum + np.where(has_balloon, last_interest, 0)
+        total_payment_amount = payments_sum + np.where(has_balloon, monthly_payment + end_balance, 0)
+
+        # "Balloon Amount" is the second to last row's balance: the balloon month with a
+        # balloon, the month before the final payment without one
+        balloon_amount = np.where(amortizing_rows > 0, np.maximum(end_balance, 0), loan_amount)
+        before_last = np.maximum(total_payments - 1 - interest_only_months, 0)
+        no_balloon_amount = np.where(total_payments - 1 > interest_only_months, np.maximum(balance(before_last), 0), loan_amount)
+
+    return {
+        "Down Payment": down_payment,
+        "Balloon Amount": np.where(has_balloon, balloon_amount, no_balloon_amount),
+        "Monthly Payment Interest Only": np.where(interest_only_months >= 1, interest_only_payment, monthly_payment),
+        "Monthly Payment Non Interest Only": np.where(has_balloon | (total_payments > interest_only_months), monthly_payment, interest_only_payment),
+        "Monthly Payment": monthly_payment,
+        "Total Interest Paid": total_interest_paid,
+        "Total Payment Amount": total_payment_amount,
+        "Seller Grand Total": total_payment_amount + down_payment,
+    }
+
+
+def sensitivity_sweep(sale_price, annual_interest_rates, down_payment_rates, balloon_years, loan_term_years, interest_only_years=None):
+    """Summary metrics over balloon years x down payment rates x interest rates.
+
+    Every metric array has shape (len(balloon_years), len(down_payment_rates),
+    len(annual_interest_rates)); the axes are returned alongside under their own names.
+    """
+    annual_interest_rates = np.asarray(annual_interest_rates, dtype=float)
+    down_payment_rates = np.asarray(down_payment_rates, dtype=float)
+    balloon_years = np.asarray([0 if b is None else b for b in balloon_years], dtype=float)
+    summary = seller_financing_summary(
+        sale_price,
+        down_payment_rates[None, :, None],
+        annual_interest_rates[None, None, :],
+        loan_term_years,
+        balloon_years[:, None, None],
+        interest_only_years,
+    )
+    return dict(summary, annual_interest_rates=annual_interest_rates, down_payment_rates=down_payment_rates, balloon_years=balloon_years)
@@ -1,72 +1,35 @@
+import inspect
+
 import pandas as pd
 import numpy as np
 import streamlit as st
 import plotly.graph_objects as go
 
+from creative_financing import diagnostics, schedules
+from creative_financing.cache import cached_seller_financing_calculator
+from creative_financing.incremental import IncrementalSchedule
+from creative_financing.schedules import yearly_rollup
+
 
 ####################################################
 #                      PARAMS                      #
 ####################################################
 st.set_page_config(layout="wide")
+PAGE_MONTHS = 60  # monthly schedule rows sent per page
+MAX_CHART_POINTS = 120
 
 
-####################################################
-#                   FUNCTION                       #
-####################################################
-def seller_financing_calculator(sale_price, down_payment_rate, annual_interest_rate, loan_term_years, balloon_due_years=None, interest_only_years=None):
-    # Calculate the initial loan amount
-    down_payment = int(sale_price * (down_payment_rate/100))
-    loan_amount = sale_price - down_payment
-    
-    # Monthly interest rate
-    monthly_interest_rate = annual_interest_rate / 100 / 12
-    # Total number of payments
-    total_payments = loan_term_years * 12
-    
-    # Calculate the monthly payment for a fully amortizing loan
-    if monthly_interest_rate > 0:
-        monthly_payment = loan_amount * monthly_interest_rate / (1 - (1 + monthly_interest_rate) ** -total_payments)
-    else:
-        monthly_payment = loan_amount / total_payments
-    
-    # Create amortization table
-    amortization_table = []
-    balance = loan_amount
-    for month in range(1, total_payments + 1):
-        interest_payment = balance * monthly_interest_rate
-        if interest_only_years and month <= interest_only_years * 12:
-            principal_payment = 0
-            monthly_payment_during_interest_only = loan_amount * monthly_interest_rate
-            amortization_table.append([month, monthly_payment_during_interest_only, interest_payment, principal_payment, balance])
-        else:
-            principal_payment = monthly_payment - interest_payment
-            balance -= principal_payment
-            amortization_table.append([month, monthly_payment, interest_payment, principal_payment, max(balance, 0)])
-        
-        if balloon_due_years and month == balloon_due_years * 12:
-            balloon_payment = balance
-            amortization_table.append([month, monthly_payment, interest_payment, principal_payment, 0])
-            break
+def to_dollars(columns, key_column):
+    # frame of the given rows only, cents to dollars
+    df = pd.DataFrame(columns)
+    amounts = [c for c in df.columns if c != key_column]
+    df[amounts] = df[amounts] / 100
+    return df
 
-    # Convert amortization table to DataFrame for better display
-    df_amortization_table = pd.DataFrame(amortization_table, columns=["Month", "Monthly Payment", "Interest", "Principal", "Remaining Balance"])
-    
-    # Total interest paid
-    total_interest_paid = df_amortization_table["Interest"].sum()
-    
-    # Total payments
-    total_payments_made = df_amortization_table["Monthly Payment"].sum() + (balloon_payment if balloon_due_years else 0)
-    
-    return {
-        "Down Payment": down_payment,
-        "Balloon Amount": df_amortization_table.iloc[-2]['Remaining Balance'],
-        "Monthly Payment Interest Only": round(df_amortization_table.iloc[0]['Monthly Payment'], 2),
-        "Monthly Payment Non Interest Only": round(df_amortization_table.iloc[-1]['Monthly Payment'], 2),
-        "Monthly Payment": round(monthly_payment, 2),
-        "Total Interest Paid": round(total_interest_paid, 2),
-        "Total Payment Amount": round(total_payments_made, 2),
-        "Amortization Table": df_amortization_table.iloc[:-1]
-    }
+
+def downsample(count, max_points):
+    # evenly spaced indices, first and last included
+    return np.unique(np.linspace(0, count - 1, min(count, max_points)).round().astype(int))
 
 
 ####################################################
@@ -76,6 +39,8 @@ st.title('Seller Financing Calculator 👥')
 st.subheader('Enter details to calculate offer terms')
 st.markdown('Want to see the properties 🏡 behind the numbers? Check out 👉 [Coffee Clozers](https://bit.ly/3EJRAa5) 🏡, we help real estate investors find cash flowing deals🤑 in up-and-coming areas within minutes ⏱️ to support their journey of financial freedom.')
 
+param_diagnostics = st.sidebar.toggle("Diagnostics", value=False, help="Time this page's computation and Streamlit work, count candidates and cache hits, and log each run as JSON.")
+diagnostics_run = diagnostics.start('seller_financing_page', enabled=param_diagnostics)
 
 
 ####################################################
@@ -106,28 +71,33 @@ with tab1:
 
     #|---------------RESULTS--------------#
     param_run_model = st.button("Run", type="primary")
-    if 'result' not in st.session_state:
-        st.session_state['result'] = None
-
-    if (param_run_model) or (st.session_state['result'] != None):
-        result = seller_financing_calculator(param_sale_price, param_down_payment_rate, param_annual_interest_rate, param_loan_term_years, balloon_due_years, interest_only_years)
-        st.session_state['result'] = result
-
-        # output
-        down_payment = st.session_state['result']["Down Payment"]
-        balloon_amount = st.session_state['result']["Balloon Amount"]
-        monthly_income_interest_only = st.session_state['result']["Monthly Payment Interest Only"]
-        monthly_income_non_interest_only = st.session_state['result']["Monthly Payment Non Interest Only"]
-        total_interest_paid = st.session_state['result']["Total Interest Paid"]
-        total_payment_amount = st.session_state['result']["Total Payment Amount"]
+    if 'result_key' not in st.session_state:
+        st.session_state['result_key'] = None
+
+    # the session keeps a key, the result itself lives in the shared cache; a miss is
+    # derived from the session's previous result when only one input changed
+    if (param_run_model) or (st.session_state['result_key'] != None):
+        with diagnostics.stage('compute'):
+            previous_key = st.session_state['result_key']
+            st.session_state['result_key'] = cached_seller_financing_calculator.key(param_sale_price, param_down_payment_rate, param_annual_interest_rate, param_loan_term_years, balloon_due_years, interest_only_years, exact=True)
+            try:
+                result = cached_seller_financing_calculator.lookup(st.session_state['result_key'], compute=IncrementalSchedule(dict(previous_key[1]) if previous_key else None))
+            except ValueError as e:
+                st.error(str(e))
+                st.stop()
+
+        # output, exact mode gives cents
+        down_payment = result["Down Payment"] / 100
+        balloon_amount = result["Balloon Amount"] / 100
+        monthly_income_interest_only = result["Monthly Payment Interest Only"] / 100
+        monthly_income_non_interest_only = result["Monthly Payment Non Interest Only"] / 100
+        total_interest_paid = result["Total Interest Paid"] / 100
+        total_payment_amount = result["Total Payment Amount"] / 100
         seller_total_payment = total_payment_amount + down_payment
 
-        # table
-        df = pd.DataFrame(st.session_state['result']["Amortization Table"])
-        df.loc[df['Month'] == 60, 'Remaining Balance'] = 0
-        for c in list(df.columns)[1:]:
-            # df[c] = df[c].apply(lambda x: '{:,.2f}'.format(x)) # str
-            df[c] = df[c].apply(lambda x: round(x, 2))
+        # table, its last row pays off the balloon (or the end of the term)
+        table = result["Amortization Table"]
+        yearly = yearly_rollup(table)
 
         # chart
         labels = ['Payment Amount', 'Interest Amount']
@@ -148,68 +118,28 @@ with tab1:
         col1.write("Seller Grand Total: ${:0,.0f}".format(seller_total_payment))
 
         col2.markdown('### Amoritization Schedule')
-        col2.write(df)
+        monthly_tab, yearly_tab, cumulative_tab = col2.tabs(["Monthly", "Yearly", "Cumulative"])
+        with monthly_tab:
+            # only the page being viewed is built and sent to the browser
+            pages = max(1, -(-len(table["Month"]) // PAGE_MONTHS))
+            page = st.number_input("Page ({} months each)".format(PAGE_MONTHS), min_value=1, max_value=pages, value=1, step=1, key='schedule_page_{}'.format(pages)) if pages > 1 else 1
+            rows = slice((page - 1) * PAGE_MONTHS, page * PAGE_MONTHS)
+            st.dataframe(to_dollars({column: values[rows] for column, values in table.items()}, 'Month'), hide_index=True)
+        with yearly_tab:
+            st.dataframe(to_dollars(yearly, 'Year'), hide_index=True)
+        with cumulative_tab:
+            points = downsample(len(table["Month"]), MAX_CHART_POINTS)
+            fig = go.Figure()
+            for column in ('Principal', 'Interest'):
+                fig.add_trace(go.Scatter(x=table["Month"][points], y=np.cumsum(table[column])[points] / 100, mode='lines', name=column))
+            fig.update_layout(xaxis_title='Month', yaxis_title='Cumulative ($)', legend=dict(orientation='h'))
+            st.plotly_chart(fig)
 
 
 with tab2:
+    # the code the calculator tab runs: exact schedules in int cents
     with st.expander("Python", expanded=False):
-        st.code(
-            '''def seller_financing_calculator(sale_price, down_payment_rate, annual_interest_rate, loan_term_years, balloon_due_years=None, interest_only_years=None):
-        # Calculate the initial loan amount
-        down_payment = int(sale_price * (down_payment_rate/100))
-        loan_amount = sale_price - down_payment
-        
-        # Monthly interest rate
-        monthly_interest_rate = annual_interest_rate / 100 / 12
-        # Total number of payments
-        total_payments = loan_term_years * 12
-        
-        # Calculate the monthly payment for a fully amortizing loan
-        if monthly_interest_rate > 0:
-            monthly_payment = loan_amount * monthly_interest_rate / (1 - (1 + monthly_interest_rate) ** -total_payments)
-        else:
-            monthly_payment = loan_amount / total_payments
-        
-        # Create amortization table
-        amortization_table = []
-        balance = loan_amount
-        for month in range(1, total_payments + 1):
-            interest_payment = balance * monthly_interest_rate
-            if interest_only_years and month <= interest_only_years * 12:
-                principal_payment = 0
-                monthly_payment_during_interest_only = loan_amount * monthly_interest_rate
-                amortization_table.append([month, monthly_payment_during_interest_only, interest_payment, principal_payment, balance])
-            else:
-                principal_payment = monthly_payment - interest_payment
-                balance -= principal_payment
-                amortization_table.append([month, monthly_payment, interest_payment, principal_payment, max(balance, 0)])
-            
-            if balloon_due_years and month == balloon_due_years * 12:
-                balloon_payment = balance
-                amortization_table.append([month, monthly_payment, interest_payment, principal_payment, 0])
-                break
-
-        # Convert amortization table to DataFrame for better display
-        df_amortization_table = pd.DataFrame(amortization_table, columns=["Month", "Monthly Payment", "Interest", "Principal", "Remaining Balance"])
-        
-        # Total interest paid
-        total_interest_paid = df_amortization_table["Interest"].sum()
-        
-        # Total payments
-        total_payments_made = df_amortization_table["Monthly Payment"].sum() + (balloon_payment if balloon_due_years else 0)
-        
-        return {
-            "Down Payment": down_payment,
-            "Balloon Amount": df_amortization_table.iloc[-2]['Remaining Balance'],
-            "Monthly Payment Interest Only": round(df_amortization_table.iloc[0]['Monthly Payment'], 2),
-            "Monthly Payment Non Interest Only": round(df_amortization_table.iloc[-1]['Monthly Payment'], 2),
-            "Monthly Payment": round(monthly_payment, 2),
-            "Total Interest Paid": round(total_interest_paid, 2),
-            "Total Payment Amount": round(total_payments_made, 2),
-            "Amortization Table": df_amortization_table.iloc[:-1]
-        }
-    ''', 
-            language='python')
+        st.code(inspect.getsource(schedules), language='python')
 
 
     with st.expander("Javascript", expanded=False):
@@ -304,4 +234,22 @@ console.log("Total Interest Paid: $", result["Total Interest Paid"]);
 console.log("Total Payment Amount: $", result["Total Payment Amount"]);
 console.table(result["Amortization Table"]);
 '''
-        st.code(code, language='javascript')
\ No newline at end of file
+        st.caption("A float dollar sketch for the browser; it does not tie out to the cent. The calculator runs the Python above.")
+        st.code(code, language='javascript')
+
+
+####################################################
+#                   DIAGNOSTICS                    #
+####################################################
+record = diagnostics.finish(diagnostics_run)
+if record:
+    compute_seconds = record['stages'].get('compute', {}).get('seconds', 0)
+    st.sidebar.markdown('### Diagnostics')
+    st.sidebar.write('Script run: {:,.1f} ms'.format(record['seconds'] * 1000))
+    st.sidebar.write('Computation: {:,.1f} ms, Streamlit: {:,.1f} ms'.format(compute_seconds * 1000, (record['seconds'] - compute_seconds) * 1000))
+    # tracemalloc is process wide: other sessions running at the same time count too
+    st.sidebar.write('Peak memory (whole process): {:,.0f} KB'.format(record['peak_memory_bytes'] / 1024))
+    if record['cache_hit_rate'] is not None:
+        st.sidebar.write('Cache hit rate: {:.0%}'.format(record['cache_hit_rate']))
+    st.sidebar.dataframe(pd.DataFrame([{'Stage': k, 'ms': v['seconds'] * 1000, 'Calls': v['calls']} for k, v in record['stages'].items()]), hide_index=True)
+    st.sidebar.json(record['counters'])
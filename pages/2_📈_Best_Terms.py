@@ -1,9 +1,13 @@
 import pandas as pd
 import numpy as np
 import streamlit as st
-import numpy_financial as npf
 import plotly.graph_objects as go
 
+from creative_financing import diagnostics
+from creative_financing.best_terms import optimize_terms
+from creative_financing.cache import cached_optimize_terms, cached_terms_frontier
+from creative_financing.stress import stress_test
+
 
 ####################################################
 #                      PARAMS                      #
@@ -11,83 +15,6 @@ import plotly.graph_objects as go
 st.set_page_config(layout="wide")
 
 
-####################################################
-#                   FUNCTION                       #
-####################################################
-def calculate_monthly_payment(principal, annual_interest_rate, term_years):
-    monthly_interest_rate = annual_interest_rate / 100 / 12
-    number_of_payments = term_years * 12
-    if monthly_interest_rate == 0:
-        return principal / number_of_payments
-    else:
-        return principal * (monthly_interest_rate * (1 + monthly_interest_rate) ** number_of_payments) / ((1 + monthly_interest_rate) ** number_of_payments - 1)
-
-def calculate_balloon_payment(principal, annual_interest_rate, term_years, balloon_years):
-    monthly_interest_rate = annual_interest_rate / 100 / 12
-    number_of_payments = term_years * 12
-    balloon_payments = balloon_years * 12
-    monthly_payment = calculate_monthly_payment(principal, annual_interest_rate, term_years)
-    remaining_balance = npf.pv(monthly_interest_rate, number_of_payments - balloon_payments, -monthly_payment, 0)
-    return remaining_balance
-
-def optimize_terms(
-        listing_price, 
-        min_down_payment_pct, 
-        max_down_payment_pct, 
-        min_interest_rate, 
-        max_interest_rate, 
-        rental_income, 
-        monthly_expenses, 
-        balloon_years, 
-        balloon_adjustable=False, 
-        required_seller_earnings_pct=5):
-    optimal_terms = None
-    target_cash_on_cash_return = 0.07  # 7%
-    required_seller_earnings = listing_price * (1 + required_seller_earnings_pct / 100)
-    
-    def search_optimal_terms(balloon_years_range):
-        nonlocal optimal_terms, max_seller_earnings
-        for down_payment_pct in range(min_down_payment_pct, max_down_payment_pct + 1):
-            for interest_rate in range(min_interest_rate, max_interest_rate + 1):
-                for offer_price in range(int(listing_price * 0.8), listing_price + 1, 1000):
-                    for balloon_years in balloon_years_range:
-                        down_payment = offer_price * (down_payment_pct / 100)
-                        loan_amount = offer_price - down_payment
-                        monthly_payment = calculate_monthly_payment(loan_amount, interest_rate, 30)
-                        annual_cash_flow = (rental_income - monthly_payment - monthly_expenses) * 12
-                        initial_cash_investment = down_payment + (monthly_expenses * 12)
-                        cash_on_cash_return = annual_cash_flow / initial_cash_investment
-
-                        # Calculate total payments including balloon payment
-                        total_payments = (monthly_payment * balloon_years * 12) + calculate_balloon_payment(loan_amount, interest_rate, 30, balloon_years)
-                        seller_earnings = down_payment + total_payments
-
-                        if cash_on_cash_return >= target_cash_on_cash_return and seller_earnings >= required_seller_earnings:
-                            if seller_earnings > max_seller_earnings:
-                                max_seller_earnings = seller_earnings
-                                optimal_terms = {
-                                    'offer_price': round(offer_price),
-                                    'down_payment_pct': round(down_payment_pct),
-                                    'interest_rate': round(interest_rate, 4),
-                                    'monthly_payment': round(monthly_payment, 4),
-                                    'monthly_cash_flow': round(round(annual_cash_flow / 12), 4),
-                                    'cash_on_cash_return': round(cash_on_cash_return, 4),
-                                    'total_payments': round(total_payments, 4),
-                                    'seller_earnings': round(seller_earnings, 4),
-                                    'balloon_years': balloon_years
-                                }
-
-    # First, search with a fixed 5-year balloon period
-    max_seller_earnings = 0
-    search_optimal_terms([balloon_years])
-
-    # If no optimal terms found, search with flexible balloon period (5 to 10 years)
-    if (not optimal_terms) and (balloon_adjustable == True):
-        search_optimal_terms(range(5, 11))
-
-    return optimal_terms
-
-
 ####################################################
 #                      APP                         #
 ####################################################
@@ -136,6 +63,9 @@ def check_password():
 if not check_password():
     st.stop()
 
+param_diagnostics = st.sidebar.toggle("Diagnostics", value=False, help="Time this page's computation and Streamlit work, count candidates and cache hits, and log each run as JSON.")
+diagnostics_run = diagnostics.start('best_terms_page', enabled=param_diagnostics)
+
 
 ####################################################
 #                      TABS                         #
@@ -160,12 +90,29 @@ with tab1:
         param_balloon_years = col1.number_input("Balloon Years", min_value=0, max_value=30, value=5, step=1)
         param_balloon_adjustable = col2.checkbox("Balloon Adjustable", value=True)
         param_required_seller_earnings_prct = col1.number_input("Required Seller Earnings %", min_value=0, max_value=100, value=5, step=1)
+        param_price_step = col2.number_input("Offer Price Step", min_value=1, max_value=100000, value=1000, step=100)
+        param_fine_resolution = col2.checkbox("Fine Resolution", value=False, help="Search fractional interest rates and down payments, to the steps below, instead of whole percents.")
+        param_rate_step = col1.number_input("Interest Rate Step %", min_value=0.001, max_value=1.0, value=0.125, step=0.125, format="%.3f")
+        param_down_payment_step = col2.number_input("Down Payment Step %", min_value=0.001, max_value=1.0, value=0.01, step=0.01, format="%.3f")
+        param_anytime = col1.checkbox("Anytime Search", value=False, help="Search the most promising terms first and show the best so far as it improves. At the time budget it stops with the best terms found and how much higher seller earnings could still go. Changing an input or clicking Run again cancels it.")
+        param_time_budget = col2.number_input("Time Budget (Seconds)", min_value=0.1, max_value=600.0, value=5.0, step=1.0)
+        param_show_frontier = col1.checkbox("Show Tradeoff Frontier", value=False, help="Plot every non-dominated combination of buyer cash on cash return and seller earnings, per down payment, to build counter-offers.")
+
+    with main1.expander("Stress Test", expanded=False):
+        param_stress_test = st.checkbox("Stress Test Best Terms", value=False, help="Hold the best terms fixed and draw rent, expenses and the refinance rate at the balloon at random to see how often the buyer misses the 7% cash on cash target.")
+        col1, col2 = st.columns(2)
+        param_scenarios = col1.number_input("Scenarios", min_value=1000, max_value=5000000, value=100000, step=100000)
+        param_seed = col2.number_input("Seed", min_value=0, max_value=2 ** 31 - 1, value=0, step=1)
+        param_rent_volatility = col1.number_input("Rent Volatility %", min_value=0, max_value=100, value=10, step=1, help="Standard deviation of monthly rent, as a % of rental income.")
+        param_expense_volatility = col2.number_input("Expense Volatility %", min_value=0, max_value=200, value=15, step=1, help="Standard deviation of monthly expenses, as a % of monthly expenses.")
+        param_refinance_spread = col1.number_input("Refinance Rate Over Seller Rate %", min_value=-10.0, max_value=20.0, value=2.0, step=0.25, help="Average refinance rate at the balloon, relative to the seller's interest rate.")
+        param_refinance_volatility = col2.number_input("Refinance Rate Volatility %", min_value=0.0, max_value=10.0, value=1.5, step=0.25)
 
     param_run_model = st.button("Run", type="primary")
 
 
     if param_run_model:
-        best_terms = optimize_terms(
+        terms_inputs = dict(
             listing_price=param_list_price,
             min_down_payment_pct=param_min_down_payment_pct,
             max_down_payment_pct=param_max_down_payment_pct, 
@@ -175,11 +122,48 @@ with tab1:
             monthly_expenses=param_monthly_expenses, 
             balloon_years=param_balloon_years, 
             balloon_adjustable=param_balloon_adjustable,
-            required_seller_earnings_pct=param_required_seller_earnings_prct
+            required_seller_earnings_pct=param_required_seller_earnings_prct,
+            price_step=param_price_step,
         )
+        if param_anytime:
+            # not cached, a partial result depends on the budget; a rerun stops the
+            # search at its next progress update
+            progress_bar = main2.progress(0.0, text='Searching')
+            best_so_far = main2.empty()
+
+            def show_progress(report):
+                progress_bar.progress(min(report['resolved'], 1.0), text='Searching, {:.0%} of rates resolved in {:.1f}s'.format(report['resolved'], report['elapsed']))
+                if report['terms']:
+                    best_so_far.write('Best so far: ${:0,.0f} offer, {}% down, {}% rate, seller earnings ${:0,.0f} of at most ${:0,.0f}'.format(
+                        report['terms']['offer_price'], report['terms']['down_payment_pct'], report['terms']['interest_rate'], report['terms']['seller_earnings'], report['upper_bound']))
+
+            with diagnostics.stage('compute'):
+                best_terms = optimize_terms(
+                    **terms_inputs,
+                    method='anytime',
+                    rate_step=param_rate_step if param_fine_resolution else 1,
+                    down_payment_step=param_down_payment_step if param_fine_resolution else 1,
+                    time_budget=param_time_budget,
+                    on_progress=show_progress
+                )
+            progress_bar.empty()
+            best_so_far.empty()
+        else:
+            with diagnostics.stage('compute'):
+                best_terms = cached_optimize_terms(
+                    **terms_inputs,
+                    method='fine' if param_fine_resolution else 'pruned',
+                    rate_step=param_rate_step if param_fine_resolution else 1,
+                    down_payment_step=param_down_payment_step if param_fine_resolution else 1
+                )
 
         main2.markdown('## Best Terms')
-        if best_terms != None:
+        if best_terms != None and 'offer_price' not in best_terms:
+            # the anytime search ran out of time before any terms, which is not the same as none existing
+            main2.write('Time budget reached before any terms were found. Terms earning the seller up to ${:0,.0f} may still exist{}; try a longer time budget.'.format(
+                best_terms["upper_bound"], ', and the flexible balloon search did not run' if param_balloon_adjustable else ''))
+            best_terms = None
+        elif best_terms != None:
             col1, col2 = main2.columns(2)
             # calcs
             offer_price_diff = best_terms["offer_price"] - param_list_price
@@ -204,6 +188,93 @@ with tab1:
             col2.write('Offer price: ${:0,.0f}'.format(best_terms["offer_price"]))
             col2.write('Interest: ${:0,.0f}'.format(interest_amount))
             col2.write('Seller earnings: ${:0,.0f}'.format(int(best_terms["seller_earnings"])))
+            if param_anytime and not best_terms["proven_optimal"]:
+                main2.caption('Time budget reached: seller earnings could be up to ${:0,.0f} higher with other terms.'.format(best_terms["earnings_gap"]))
 
         else:
-            main2.write('No ideal terms with current constraints')
\ No newline at end of file
+            main2.write('No ideal terms with current constraints')
+
+        #|---------------STRESS TEST--------------#
+        if param_stress_test and best_terms != None:
+            with diagnostics.stage('compute'):
+                stress = stress_test(
+                    best_terms,
+                    rental_income=param_rental_income,
+                    monthly_expenses=param_monthly_expenses,
+                    scenarios=param_scenarios,
+                    seed=param_seed,
+                    distributions={
+                        'rent': {'kind': 'normal', 'mean': param_rental_income, 'std': param_rental_income * param_rent_volatility / 100},
+                        'expenses': {'kind': 'lognormal', 'mean': param_monthly_expenses, 'std': param_monthly_expenses * param_expense_volatility / 100},
+                        'refinance_rate': {'kind': 'normal', 'mean': best_terms['interest_rate'] + param_refinance_spread, 'std': param_refinance_volatility},
+                    },
+                )
+            main2.markdown('### Stress Test')
+            col1, col2 = main2.columns(2)
+            col1.metric('Chance of missing 7% cash on cash', '{:.1%}'.format(stress['cash_on_cash_return']['probability_below_target']))
+            col2.metric('After refinancing the balloon', '{:.1%}'.format(stress['cash_on_cash_after_refinance']['probability_below_target']))
+            col1.write('Cash on cash 5th-95th percentile: {:.1%} to {:.1%}'.format(stress['cash_on_cash_return']['p5'], stress['cash_on_cash_return']['p95']))
+            col2.write('After refinancing: {:.1%} to {:.1%}'.format(stress['cash_on_cash_after_refinance']['p5'], stress['cash_on_cash_after_refinance']['p95']))
+
+            fig = go.Figure()
+            for name, label in (('cash_on_cash_return', 'Until balloon'), ('cash_on_cash_after_refinance', 'After refinance')):
+                histogram = stress[name]['histogram']
+                fig.add_trace(go.Scatter(x=histogram['edges'][:-1] * 100, y=histogram['counts'] / stress['scenarios'], mode='lines', line=dict(shape='hv'), name=label))
+            fig.add_vline(x=stress['target_cash_on_cash_return'] * 100, line_dash='dash', annotation_text='7% target')
+            fig.update_layout(xaxis_title='Buyer cash on cash return (%)', yaxis_title='Share of scenarios', legend=dict(orientation='h'))
+            main2.plotly_chart(fig)
+
+        #|---------------FRONTIER--------------#
+        if param_show_frontier:
+            with diagnostics.stage('compute'):
+                frontier = cached_terms_frontier(
+                    listing_price=param_list_price,
+                    min_down_payment_pct=param_min_down_payment_pct,
+                    max_down_payment_pct=param_max_down_payment_pct,
+                    min_interest_rate=param_min_interest_rate_pct,
+                    max_interest_rate=param_max_interest_rate_pct,
+                    rental_income=param_rental_income,
+                    monthly_expenses=param_monthly_expenses,
+                    balloon_years=param_balloon_years,
+                    balloon_adjustable=param_balloon_adjustable,
+                    required_seller_earnings_pct=param_required_seller_earnings_prct,
+                    price_step=param_price_step
+                )
+            main2.markdown('### Tradeoff Frontier')
+            if len(frontier['offer_price']) == 0:
+                main2.write('No terms meet the constraints')
+            else:
+                hover = ['Offer price: ${:0,.0f}<br>Down payment: {}%<br>Interest rate: {:g}%<br>Balloon years: {:g}'.format(*row)
+                         for row in zip(frontier['offer_price'], frontier['down_payment_pct'], frontier['interest_rate'], frontier['balloon_years'])]
+                fig = go.Figure()
+                fig.add_trace(go.Scatter(
+                    x=frontier['cash_on_cash_return'] * 100, y=frontier['seller_earnings'], mode='markers', name='Per down payment',
+                    marker=dict(color=frontier['down_payment_pct'], colorscale='Viridis', showscale=True, colorbar=dict(title='Down %')),
+                    text=hover, hovertemplate='%{text}<br>Cash on cash: %{x:.2f}%<br>Seller earnings: $%{y:,.0f}<extra></extra>'))
+                overall = np.argsort(frontier['cash_on_cash_return'][frontier['overall']])
+                fig.add_trace(go.Scatter(
+                    x=frontier['cash_on_cash_return'][frontier['overall']][overall] * 100, y=frontier['seller_earnings'][frontier['overall']][overall],
+                    mode='lines', name='Overall frontier', line=dict(color='black', shape='hv'), hoverinfo='skip'))
+                if best_terms != None:
+                    fig.add_trace(go.Scatter(
+                        x=[best_terms['cash_on_cash_return'] * 100], y=[best_terms['seller_earnings']], mode='markers', name='Best terms',
+                        marker=dict(symbol='star', size=16, color='red')))
+                fig.update_layout(xaxis_title='Buyer cash on cash return (%)', yaxis_title='Seller earnings ($)', legend=dict(orientation='h'))
+                main2.plotly_chart(fig)
+
+
+####################################################
+#                   DIAGNOSTICS                    #
+####################################################
+record = diagnostics.finish(diagnostics_run)
+if record:
+    compute_seconds = record['stages'].get('compute', {}).get('seconds', 0)
+    st.sidebar.markdown('### Diagnostics')
+    st.sidebar.write('Script run: {:,.1f} ms'.format(record['seconds'] * 1000))
+    st.sidebar.write('Computation: {:,.1f} ms, Streamlit: {:,.1f} ms'.format(compute_seconds * 1000, (record['seconds'] - compute_seconds) * 1000))
+    # tracemalloc is process wide: other sessions running at the same time count too
+    st.sidebar.write('Peak memory (whole process): {:,.0f} KB'.format(record['peak_memory_bytes'] / 1024))
+    if record['cache_hit_rate'] is not None:
+        st.sidebar.write('Cache hit rate: {:.0%}'.format(record['cache_hit_rate']))
+    st.sidebar.dataframe(pd.DataFrame([{'Stage': k, 'ms': v['seconds'] * 1000, 'Calls': v['calls']} for k, v in record['stages'].items()]), hide_index=True)
+    st.sidebar.json(record['counters'])
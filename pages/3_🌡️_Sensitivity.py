@@ -0,0 +1,78 @@
+import io
+
+import pandas as pd
+import numpy as np
+import streamlit as st
+import plotly.graph_objects as go
+
+from creative_financing.sweep import sensitivity_sweep
+
+
+####################################################
+#                      PARAMS                      #
+####################################################
+st.set_page_config(layout="wide")
+
+METRICS = ["Monthly Payment", "Balloon Amount", "Seller Grand Total", "Total Interest Paid", "Monthly Payment Interest Only"]
+
+
+####################################################
+#                      APP                         #
+####################################################
+st.title('Sensitivity 🌡️')
+st.subheader('See how the seller financing numbers move across interest rates, down payments and balloons')
+
+
+####################################################
+#                      TABS                         #
+####################################################
+tab1, = st.tabs(["Sweep"])
+#|------------------METRICS-------------------|#
+with tab1:
+    col1, col2, col3 = st.columns([1,1,2])
+
+    # inputs
+    param_sale_price = col1.number_input("Sale price", min_value=0, max_value=10000000, value=400000, step=10000)
+    param_loan_term_years = col2.number_input("Loan Term (Years)", min_value=1, max_value=50, value=30, step=1)
+    param_interest_only_years = col1.number_input("Interest Only for (Years)", min_value=0, max_value=100, value=0, step=1)
+    param_balloon_years = col2.multiselect("Balloon Due in (Years)", options=["None"] + list(range(1, 51)), default=[3, 5, 7, 10], help="One heatmap per balloon. 'None' runs the loan to term.")
+
+    param_min_rate, param_max_rate = col1.slider("Interest rate range %", min_value=0.0, max_value=20.0, value=(0.0, 12.0), step=0.125)
+    param_rate_steps = col2.number_input("Interest rate steps", min_value=2, max_value=1000, value=200, step=10)
+    param_min_down, param_max_down = col1.slider("Down payment range %", min_value=0.0, max_value=100.0, value=(0.0, 50.0), step=0.5)
+    param_down_steps = col2.number_input("Down payment steps", min_value=2, max_value=1000, value=100, step=10)
+    param_metric = col1.selectbox("Metric", METRICS, index=0)
+
+    #|---------------RESULTS--------------#
+    if param_balloon_years:
+        balloon_years = [None if b == "None" else b for b in param_balloon_years]
+        rates = np.linspace(param_min_rate, param_max_rate, int(param_rate_steps))
+        down_payment_rates = np.linspace(param_min_down, param_max_down, int(param_down_steps))
+        sweep = sensitivity_sweep(param_sale_price, rates, down_payment_rates, balloon_years, param_loan_term_years, param_interest_only_years)
+        col3.metric("Scenarios", "{:,}".format(sweep[param_metric].size))
+
+        # one heatmap per balloon, sharing a color scale so they compare at a glance
+        values = sweep[param_metric]
+        labels = ['No balloon' if b is None else '{} year balloon'.format(b) for b in balloon_years]
+        for label, grid in zip(labels, values):
+            fig = go.Figure(data=go.Heatmap(
+                z=grid, x=rates, y=down_payment_rates, zmin=np.nanmin(values), zmax=np.nanmax(values), colorscale='Viridis',
+                colorbar=dict(title='$'), hovertemplate='Interest rate: %{x:.3f}%<br>Down payment: %{y:.1f}%<br>' + param_metric + ': $%{z:,.0f}<extra></extra>'))
+            fig.update_layout(title='{} — {}'.format(param_metric, label), xaxis_title='Interest rate (%)', yaxis_title='Down payment (%)')
+            st.plotly_chart(fig)
+
+        # export, one row per scenario; only built on request since CSV of 10^5 rows is slow
+        if st.toggle("Export"):
+            param_format = st.radio("Format", ["CSV", "Parquet"], horizontal=True)
+            b, d, r = np.meshgrid(sweep['balloon_years'], down_payment_rates, rates, indexing='ij')
+            df = pd.DataFrame({"Balloon Years": b.ravel(), "Down Payment Rate": d.ravel(), "Interest Rate": r.ravel(), **{m: sweep[m].ravel() for m in METRICS}})
+            if param_format == "CSV":
+                buffer = io.StringIO()
+                df.to_csv(buffer, index=False, float_format='%.2f')
+                st.download_button("Download CSV", buffer.getvalue(), file_name="sensitivity_sweep.csv", mime="text/csv")
+            else:
+                buffer = io.BytesIO()
+                df.to_parquet(buffer, index=False)
+                st.download_button("Download Parquet", buffer.getvalue(), file_name="sensitivity_sweep.parquet", mime="application/octet-stream")
+    else:
+        st.write('Select at least one balloon')
@@ -0,0 +1,82 @@
+import io
+
+import pandas as pd
+import numpy as np
+import streamlit as st
+import plotly.graph_objects as go
+
+from creative_financing.batch import solve_rows
+from creative_financing.inverse import solve_terms
+
+
+####################################################
+#                      PARAMS                      #
+####################################################
+st.set_page_config(layout="wide")
+
+SOLVE_FOR = {"Offer price": "offer_price", "Interest rate": "interest_rate", "Down payment %": "down_payment_pct"}
+METRICS = {"Monthly payment": "monthly_payment", "Buyer monthly cash flow": "monthly_cash_flow", "Buyer cash on cash return %": "cash_on_cash_return", "Balloon amount": "balloon_amount"}
+
+
+def format_solution(solve_for, value):
+    if np.isnan(value):
+        return "No solution"
+    if solve_for == "offer_price":
+        return "${:0,.0f}".format(value)
+    return "{:.3f}%".format(value)
+
+
+####################################################
+#                      APP                         #
+####################################################
+st.title('Target Terms 🎯')
+st.subheader('Start from the number the deal has to hit and solve for the offer price, interest rate or down payment')
+
+
+####################################################
+#                      TABS                         #
+####################################################
+tab1, tab2 = st.tabs(["Solver", "Batch"])
+#|------------------METRICS-------------------|#
+with tab1:
+    col1, col2, col3 = st.columns([1,1,2])
+
+    # inputs
+    param_solve_for = col1.selectbox("Solve for", list(SOLVE_FOR))
+    param_metric = col2.selectbox("Target", list(METRICS), help="Buyer metrics are met by any lower price or rate than the solution. The down payment solved for is the lowest that meets them; at low rates more down lowers cash on cash return, so that is 0%. The balloon amount is matched exactly.")
+    param_target = col1.number_input("Target value", value=7.0 if METRICS[param_metric] == "cash_on_cash_return" else 400.0, step=10.0)
+    param_balloon_years = col2.number_input("Balloon Due in (Years)", min_value=1, max_value=29, value=5, step=1)
+    param_offer_price = col1.number_input("Offer price", min_value=0, max_value=10000000, value=350000, step=10000, disabled=param_solve_for == "Offer price")
+    param_down_payment_pct = col2.number_input("Down payment %", min_value=0.0, max_value=100.0, value=10.0, step=0.5, disabled=param_solve_for == "Down payment %")
+    param_interest_rate = col1.number_input("Interest rate %", min_value=0.0, max_value=100.0, value=5.0, step=0.125, disabled=param_solve_for == "Interest rate")
+    param_rental_income = col2.number_input("Rental Income", min_value=0, max_value=100000, value=2500, step=100)
+    param_monthly_expenses = col1.number_input("Monthly Expenses", min_value=0, max_value=100000, value=600, step=10)
+
+    solve_for = SOLVE_FOR[param_solve_for]
+    metric = METRICS[param_metric]
+    scale = 100 if metric == "cash_on_cash_return" else 1
+    terms = {"offer_price": param_offer_price, "down_payment_pct": param_down_payment_pct, "interest_rate": param_interest_rate}
+    del terms[solve_for]
+
+    #|---------------RESULTS--------------#
+    # the chosen target plus a curve of targets around it, solved in one call
+    targets = np.linspace(param_target * 0.5, param_target * 1.5, 201) if param_target else np.linspace(-500, 500, 201)
+    solved = solve_terms(solve_for, metric, np.append(targets, param_target) / scale, rental_income=param_rental_income, monthly_expenses=param_monthly_expenses, balloon_years=param_balloon_years, **terms)
+    col3.metric(param_solve_for, format_solution(solve_for, solved[-1]))
+
+    fig = go.Figure(go.Scatter(x=targets, y=solved[:-1], mode='lines', name=param_solve_for))
+    fig.add_trace(go.Scatter(x=[param_target], y=[solved[-1]], mode='markers', marker=dict(size=12, symbol='star'), name='Target'))
+    fig.update_layout(xaxis_title=param_metric, yaxis_title=param_solve_for, showlegend=False)
+    col3.plotly_chart(fig)
+
+with tab2:
+    st.write('Upload a CSV with a `target` column and any of `offer_price`, `down_payment_pct`, `interest_rate`, `rental_income`, `monthly_expenses` and `balloon_years`. Blank or missing columns take the values on the Solver tab. Cash on cash targets are fractions (0.07 for 7%).')
+    param_file = st.file_uploader("Deals", type=["csv"])
+    if param_file is not None:
+        rows = pd.read_csv(param_file, dtype=str, keep_default_na=False).to_dict('records')
+        defaults = dict(terms, rental_income=param_rental_income, monthly_expenses=param_monthly_expenses, balloon_years=param_balloon_years)
+        df = pd.DataFrame(solve_rows(rows, solve_for, metric, defaults))
+        st.write(df)
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False)
+        st.download_button("Download CSV", buffer.getvalue(), file_name="target_terms.csv", mime="text/csv")